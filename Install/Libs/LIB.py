@@ -6,6 +6,7 @@ que desejar disponibilizar para importação centralizada.
 """
 
 import importlib
+from collections.abc import Mapping
 
 LIBRARIES = [
     "os",
@@ -29,8 +30,31 @@ def load_modules(library_list=None):
             imported_modules[lib_name] = None
     return imported_modules
 
-# Instancia automaticamente os módulos ao importar este arquivo:
-MODULES = load_modules()
+class LazyModules(Mapping):
+    """
+    Mapeamento nome -> módulo que só importa cada biblioteca no primeiro acesso.
+    Mantém o mesmo comportamento de load_modules (módulo ausente vira None com aviso),
+    sem pagar o custo de importação de tudo em LIBRARIES ao importar este arquivo.
+    """
+    def __init__(self, library_list=None):
+        self._names = list(LIBRARIES if library_list is None else library_list)
+        self._loaded = {}
+
+    def __getitem__(self, lib_name):
+        if lib_name not in self._names:
+            raise KeyError(lib_name)
+        if lib_name not in self._loaded:
+            self._loaded[lib_name] = load_modules([lib_name])[lib_name]
+        return self._loaded[lib_name]
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+# Resolve cada módulo no primeiro acesso (MODULES["os"], MODULES.get("json")...):
+MODULES = LazyModules()
 
 # Uso em outros scripts:
 # from Install.Libs.LIB import MODULES
@@ -0,0 +1,488 @@
+# Interface/interface.py
+
+"""
+interface.py
+Serviço local (HTTP em localhost) que mantém o pipeline "quente" entre análises.
+
+O processo importa os módulos uma única vez, mantém um cache de taxonomia por digest
+(pré-carregado do índice SQLite, onde os resultados continuam sendo gravados) e recebe
+diretórios de amostras como jobs, enfileirados e executados por um pool limitado de workers.
+
+Cada job: validação -> limpeza das amostras do job (em paralelo entre jobs) -> etapas
+globais (QC, únicas, taxonomia, matriz), que usam os diretórios compartilhados de
+assets/Collections e por isso rodam uma de cada vez. Validação/limpeza seguram um lock
+compartilhado e as etapas globais o mesmo lock em modo exclusivo, de modo que a agregação
+nunca lê arquivos de Raw_sequences/Sequences_cleaned ainda sendo escritos; jobs com a
+mesma amostra são serializados entre si.
+
+Custo: as etapas globais refazem únicas e matriz sobre TODAS as amostras já processadas
+(a matriz é conjunta), então o tempo de cada job cresce com o histórico acumulado em
+assets/Collections. O BLAST, parte mais cara, só roda para sequências fora do cache.
+Para lotes grandes, submeta um diretório com várias amostras em vez de um job por amostra.
+
+Endpoints:
+    GET  /health                 estado do serviço (fila, jobs em execução)
+    POST /jobs                   {"sample_dir": "..."} -> 202 {"id": ..., "status": "queued"}
+    GET  /jobs                   lista resumida dos jobs
+    GET  /jobs/<id>              estado, eventos e métricas do job
+    GET  /jobs/<id>/events       progresso em streaming (uma linha JSON por evento)
+
+Uso:
+    python -m Interface.interface --port 8765 --workers 2 --queue 16
+    curl -X POST localhost:8765/jobs -d '{"sample_dir": "dados/amostra1"}'
+    curl -N localhost:8765/jobs/<id>/events
+"""
+
+from Install.Libs.LIB import MODULES
+os = MODULES["os"]
+json = MODULES["json"]
+
+import multiprocessing
+import queue
+import threading
+import time
+import uuid
+from contextlib import ExitStack, contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from Modules.main import validate_input, clean_sample, run_global_stages, blast_taxonomy_func, QC_ROOT
+from Modules.metrics import PipelineMetrics
+from Modules.database import DEFAULT_DB_PATH, connect, taxonomy_by_digest
+from Modules.encoding import sequence_digest
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Retenção dos jobs terminados (com seus eventos e métricas) na memória do serviço.
+DEFAULT_MAX_JOBS = 256
+DEFAULT_JOB_TTL = 24 * 3600
+# Resultados de BLAST que indicam falha (não vão para o cache, para serem refeitos).
+_UNCACHED_PREFIXES = ("BLAST_Error", "Error:", "Parse_Error")
+
+
+class _ReadWriteLock:
+    """
+    Lock leitores/escritor: vários `shared()` ao mesmo tempo, ou um único `exclusive()`.
+    Escritores aguardando têm preferência, para as etapas globais não esperarem para sempre.
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def shared(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self._cond:
+            self._writers_waiting += 1
+            try:
+                while self._writer or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+def _candidate_samples(input_path):
+    """
+    Nomes de amostra que find_valid_fastq_files pode gerar para input_path (arquivo,
+    pasta e subpastas), conhecidos antes da validação para serializar jobs por amostra.
+    """
+    if os.path.isfile(input_path):
+        return {os.path.splitext(os.path.basename(input_path))[0]}
+    names = {os.path.basename(input_path)}
+    if os.path.isdir(input_path):
+        names.update(d for d in os.listdir(input_path) if os.path.isdir(os.path.join(input_path, d)))
+    return names
+
+
+class TaxonomyCache:
+    """
+    Cache thread-safe sequência -> taxonomia, indexado por sequence_digest.
+    O BLAST roda como subprocesso a cada consulta (o banco não pode ficar residente neste
+    processo); o cache evita repetir a busca para sequências já classificadas, inclusive em
+    execuções anteriores (pré-carregado da tabela 'taxonomy' do índice SQLite).
+    """
+    def __init__(self, taxonomy_func, db_path=None):
+        self.taxonomy_func = taxonomy_func
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._cache = {}
+        if db_path and os.path.exists(db_path):
+            conn = connect(db_path)
+            try:
+                self._cache = {digest: tax for digest, tax in taxonomy_by_digest(conn).items()
+                               if tax and not tax.startswith(_UNCACHED_PREFIXES)}
+            finally:
+                conn.close()
+
+    @property
+    def size(self):
+        """Número de taxonomias em cache."""
+        return len(self._cache)
+
+    def __call__(self, sequence):
+        digest = sequence_digest(sequence)
+        with self._lock:
+            taxonomy = self._cache.get(digest)
+            if taxonomy is not None:
+                self.hits += 1
+                return taxonomy
+            self.misses += 1
+        taxonomy = self.taxonomy_func(sequence)
+        if taxonomy and not taxonomy.startswith(_UNCACHED_PREFIXES):
+            with self._lock:
+                self._cache[digest] = taxonomy
+        return taxonomy
+
+
+class Job:
+    """Um diretório de amostras submetido ao serviço, com seus eventos de progresso."""
+    def __init__(self, sample_dir):
+        self.id = uuid.uuid4().hex[:12]
+        self.sample_dir = sample_dir
+        self.status = "queued"
+        self.error = None
+        self.samples = []
+        self.metrics = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.events = []
+        self._changed = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status in ("done", "error")
+
+    def emit(self, event, **fields):
+        with self._changed:
+            self.events.append(dict(event=event, time=time.time(), **fields))
+            self._changed.notify_all()
+
+    def iter_events(self, timeout=30.0):
+        """Gera os eventos do job à medida que chegam, até o job terminar."""
+        sent = 0
+        while True:
+            with self._changed:
+                if sent >= len(self.events) and not self.done:
+                    self._changed.wait(timeout)
+                pending = self.events[sent:]
+                finished = self.done
+            for event in pending:
+                yield event
+            sent += len(pending)
+            if finished and sent >= len(self.events):
+                return
+            if not pending:
+                yield {"event": "keepalive", "time": time.time()}
+
+    def to_dict(self, full=False):
+        data = {
+            "id": self.id,
+            "sample_dir": self.sample_dir,
+            "status": self.status,
+            "samples": self.samples,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if full:
+            data["events"] = list(self.events)
+            data["metrics"] = self.metrics.to_dict() if self.metrics is not None else None
+        return data
+
+
+class PipelineService:
+    """
+    Fila de jobs com pool limitado de workers.
+
+    Args:
+        workers (int): Jobs executados ao mesmo tempo.
+        max_queue (int): Jobs aguardando; além disso, submit() recusa (queue.Full).
+        memory_budget_mb (float): Repassado à agregação de únicas (modo em disco).
+        qc_report (bool): Gera o relatório de QC a cada job.
+        db_path (str): Índice SQLite (taxonomia persistida e pré-carregada no cache).
+        taxonomy_func (callable): Classificação por sequência (padrão: BLAST local).
+        max_jobs (int): Jobs terminados mantidos em memória (os mais antigos são descartados).
+        job_ttl (float): Segundos que um job terminado fica consultável (None = sem limite).
+    """
+    def __init__(self, workers=2, max_queue=16, memory_budget_mb=None, qc_report=False,
+                 db_path=DEFAULT_DB_PATH, taxonomy_func=None, max_jobs=DEFAULT_MAX_JOBS,
+                 job_ttl=DEFAULT_JOB_TTL):
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self.job_ttl = job_ttl
+        self.memory_budget_mb = memory_budget_mb
+        self.qc_report = qc_report
+        self.db_path = db_path
+        self.taxonomy = TaxonomyCache(
+            taxonomy_func if taxonomy_func is not None else blast_taxonomy_func(), db_path)
+        self.jobs = {}
+        self._jobs_lock = threading.Lock()
+        # Os pools de processos das etapas globais partem de um processo com threads (HTTP e
+        # workers): fork nesse estado pode herdar locks presos, então usam "spawn".
+        self._mp_context = multiprocessing.get_context("spawn")
+        self.started_at = time.time()
+        self._queue = queue.Queue(maxsize=max_queue)
+        # Validação/limpeza escrevem em Raw_sequences/Sequences_cleaned (modo compartilhado);
+        # as etapas globais leem esses diretórios inteiros (modo exclusivo).
+        self._collections_lock = _ReadWriteLock()
+        # Um lock por nome de amostra: dois jobs não escrevem os mesmos arquivos ao mesmo tempo.
+        self._sample_locks = {}
+        self._sample_locks_guard = threading.Lock()
+        self._threads = []
+        self._warm_up()
+
+    def _warm_up(self):
+        # Resolve as dependências pesadas uma vez, fora do caminho de cada job.
+        for name in ("numpy", "pandas"):
+            try:
+                __import__(name)
+            except ImportError:
+                pass
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"pipeline-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    def submit(self, sample_dir):
+        """Enfileira um job; levanta ValueError (entrada inválida) ou queue.Full (fila cheia)."""
+        if not sample_dir or not os.path.exists(sample_dir):
+            raise ValueError(f"Caminho não encontrado: '{sample_dir}'")
+        job = Job(os.path.abspath(sample_dir))
+        job.emit("queued", sample_dir=job.sample_dir)
+        with self._jobs_lock:
+            self._prune_jobs()
+            self.jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._jobs_lock:
+                del self.jobs[job.id]
+            raise
+        return job
+
+    def _prune_jobs(self):
+        """Descarta jobs terminados além de max_jobs ou mais velhos que job_ttl (chamar com _jobs_lock)."""
+        finished = sorted((j for j in self.jobs.values() if j.done), key=lambda j: j.finished_at)
+        if self.job_ttl is not None:
+            cutoff = time.time() - self.job_ttl
+            expired = [j for j in finished if j.finished_at < cutoff]
+            finished = finished[len(expired):]
+            for job in expired:
+                del self.jobs[job.id]
+        for job in finished[:max(0, len(finished) - self.max_jobs)]:
+            del self.jobs[job.id]
+
+    def list_jobs(self):
+        with self._jobs_lock:
+            self._prune_jobs()
+            return list(self.jobs.values())
+
+    def status(self):
+        jobs = self.list_jobs()
+        running = sum(1 for j in jobs if j.status == "running")
+        return {
+            "status": "ok",
+            "uptime_seconds": time.time() - self.started_at,
+            "workers": self.workers,
+            "queued": self._queue.qsize(),
+            "running": running,
+            "jobs": len(jobs),
+            "taxonomy_cache": {"size": self.taxonomy.size, "hits": self.taxonomy.hits,
+                               "misses": self.taxonomy.misses},
+        }
+
+    @contextmanager
+    def _samples_locked(self, names):
+        # Ordem fixa de aquisição para não haver deadlock entre jobs com amostras em comum.
+        with self._sample_locks_guard:
+            locks = [self._sample_locks.setdefault(name, threading.Lock()) for name in sorted(names)]
+        with ExitStack() as stack:
+            for lock in locks:
+                stack.enter_context(lock)
+            yield
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            try:
+                self._run(job)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job):
+        def listener(event, record):
+            fields = {"stage": record.name, "sample": record.sample}
+            if event == "end":
+                fields.update(wall_seconds=record.wall_seconds, records=record.records)
+            job.emit(f"stage_{event}", **fields)
+
+        job.status = "running"
+        job.started_at = time.time()
+        job.metrics = metrics = PipelineMetrics(listener=listener, shared_process=True)
+        job.emit("running")
+        try:
+            with self._samples_locked(_candidate_samples(job.sample_dir)), self._collections_lock.shared():
+                job.samples = sorted(validate_input(job.sample_dir, metrics))
+                if not job.samples:
+                    raise ValueError(f"Nenhum arquivo FASTQ válido em '{job.sample_dir}'")
+                for amostra in job.samples:
+                    clean_sample(amostra, metrics, self.qc_report, QC_ROOT)
+            job.emit("waiting_global_stages")
+            with self._collections_lock.exclusive():
+                df_abundancia = run_global_stages(metrics, self.memory_budget_mb, workers=self.workers,
+                                                  qc_report=self.qc_report, db_path=self.db_path,
+                                                  taxonomy_func=self.taxonomy, mp_context=self._mp_context)
+            job.finished_at = time.time()
+            job.status = "done"
+            job.emit("done", unique_sequences=len(df_abundancia))
+        except Exception as e:
+            job.finished_at = time.time()
+            job.error = str(e)
+            job.status = "error"
+            job.emit("error", error=str(e))
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        server_version = "ProjetoA/1.0"
+
+        def _send_json(self, status, data):
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _job(self, job_id):
+            job = service.jobs.get(job_id)
+            if job is None:
+                self._send_json(404, {"error": f"Job '{job_id}' não encontrado"})
+            return job
+
+        def do_GET(self):
+            parts = [p for p in self.path.split("?")[0].split("/") if p]
+            if parts == ["health"]:
+                self._send_json(200, service.status())
+            elif parts == ["jobs"]:
+                self._send_json(200, [j.to_dict() for j in service.list_jobs()])
+            elif len(parts) == 2 and parts[0] == "jobs":
+                job = self._job(parts[1])
+                if job is not None:
+                    self._send_json(200, job.to_dict(full=True))
+            elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "events":
+                job = self._job(parts[1])
+                if job is not None:
+                    self._stream_events(job)
+            else:
+                self._send_json(404, {"error": "Rota não encontrada"})
+
+        def _stream_events(self, job):
+            # HTTP/1.0: o corpo termina quando a conexão é fechada (fim do job).
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            try:
+                for event in job.iter_events():
+                    self.wfile.write((json.dumps(event) + "\n").encode())
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/jobs":
+                self._send_json(404, {"error": "Rota não encontrada"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                job = service.submit(payload.get("sample_dir"))
+            except (ValueError, AttributeError) as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            except queue.Full:
+                self._send_json(503, {"error": "Fila de jobs cheia, tente novamente mais tarde"})
+                return
+            self._send_json(202, job.to_dict())
+
+        def log_message(self, format, *args):
+            print(f"[HTTP] {self.address_string()} {format % args}")
+
+    return Handler
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=2, max_queue=16, memory_budget_mb=None,
+          qc_report=False, db_path=DEFAULT_DB_PATH, blast_db_path=None, max_jobs=DEFAULT_MAX_JOBS,
+          job_ttl=DEFAULT_JOB_TTL):
+    """Sobe o serviço e atende até Ctrl+C."""
+    taxonomy_func = blast_taxonomy_func(blast_db_path) if blast_db_path else None
+    service = PipelineService(workers, max_queue, memory_budget_mb, qc_report, db_path, taxonomy_func,
+                              max_jobs, job_ttl)
+    service.start()
+    httpd = ThreadingHTTPServer((host, port), make_handler(service))
+    httpd.daemon_threads = True
+    print(f"[INFO] Serviço do pipeline em http://{host}:{port} "
+          f"({workers} workers, fila de {max_queue}, {service.taxonomy.size} taxonomias em cache)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[INFO] Encerrando o serviço...")
+    finally:
+        httpd.server_close()
+        service.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serviço local de jobs do pipeline.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=2, help="Jobs executados ao mesmo tempo.")
+    parser.add_argument("--queue", type=int, default=16, help="Máximo de jobs aguardando.")
+    parser.add_argument("--max-jobs", type=int, default=DEFAULT_MAX_JOBS, help="Jobs terminados mantidos em memória.")
+    parser.add_argument("--job-ttl", type=float, default=DEFAULT_JOB_TTL,
+                        help="Segundos que um job terminado fica consultável.")
+    parser.add_argument("--memory-budget", type=float, default=None, help="MB por bucket (modo em disco).")
+    parser.add_argument("--qc-report", action="store_true")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    parser.add_argument("--blast-db", default=None, help="Banco BLAST local.")
+    a = parser.parse_args()
+    serve(a.host, a.port, a.workers, a.queue, a.memory_budget, a.qc_report, a.db, a.blast_db,
+          a.max_jobs, a.job_ttl)
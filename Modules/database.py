@@ -0,0 +1,241 @@
+# Modules/database.py
+
+"""
+database.py
+Índice SQLite consultável sobre sequências únicas, taxonomia e abundância por amostra.
+
+Tabelas:
+ - uniques(digest, sequence, length, id, json_file): uma linha por sequência única
+ - taxonomy(digest, taxonomy, updated_at): classificação de cada sequência única
+ - sample_counts(digest, sample, source, count): ocorrências por amostra;
+   source = 'cleaned' (sequências limpas) ou 'raw' (leituras brutas, matriz de abundância)
+
+Todas as cargas são em lote (executemany) dentro de uma única transação.
+
+Uso:
+    python -m Modules.database index assets/Collections/Unique
+    python -m Modules.database sequence ACGTACGT...
+    python -m Modules.database taxon Bacillus
+"""
+
+from Install.Libs.LIB import MODULES
+os = MODULES["os"]
+json = MODULES["json"]
+
+import sqlite3
+import time
+
+from Modules.encoding import sequence_digest
+
+DEFAULT_DB_PATH = os.path.join("assets", "Collections", "sequences.sqlite")
+_BATCH_SIZE = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS uniques (
+    digest    TEXT PRIMARY KEY,
+    sequence  TEXT NOT NULL,
+    length    INTEGER NOT NULL,
+    id        TEXT,
+    json_file TEXT
+);
+CREATE TABLE IF NOT EXISTS taxonomy (
+    digest     TEXT PRIMARY KEY,
+    taxonomy   TEXT,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS sample_counts (
+    digest TEXT NOT NULL,
+    sample TEXT NOT NULL,
+    source TEXT NOT NULL,
+    count  INTEGER NOT NULL,
+    PRIMARY KEY (digest, sample, source)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_uniques_id ON uniques(id);
+CREATE INDEX IF NOT EXISTS idx_taxonomy_taxonomy ON taxonomy(taxonomy);
+CREATE INDEX IF NOT EXISTS idx_sample_counts_sample ON sample_counts(sample, source, digest);
+"""
+
+
+def connect(db_path=DEFAULT_DB_PATH):
+    """Abre (e cria, se preciso) o banco com o esquema do projeto."""
+    db_dir = os.path.dirname(db_path)
+    if db_dir and not os.path.exists(db_dir):
+        os.makedirs(db_dir)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class BulkLoader:
+    """
+    Acumula linhas e as insere em lotes com executemany, tudo em uma transação:
+    ou a carga inteira é gravada, ou nada (rollback em caso de erro).
+
+        with BulkLoader(conn) as loader:
+            loader.add_unique(data, json_file)
+    """
+    def __init__(self, conn, batch_size=_BATCH_SIZE):
+        self.conn = conn
+        self.batch_size = batch_size
+        self._pending = {"uniques": [], "sample_counts": [], "taxonomy": []}
+        self._sql = {
+            "uniques": "INSERT OR REPLACE INTO uniques (digest, sequence, length, id, json_file) VALUES (?, ?, ?, ?, ?)",
+            "sample_counts": "INSERT OR REPLACE INTO sample_counts (digest, sample, source, count) VALUES (?, ?, ?, ?)",
+            "taxonomy": "INSERT OR REPLACE INTO taxonomy (digest, taxonomy, updated_at) VALUES (?, ?, ?)",
+        }
+
+    def __enter__(self):
+        self.conn.execute("BEGIN")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+            self.conn.commit()
+        else:
+            self.conn.rollback()
+        return False
+
+    def _add(self, table, row):
+        rows = self._pending[table]
+        rows.append(row)
+        if len(rows) >= self.batch_size:
+            self.conn.executemany(self._sql[table], rows)
+            rows.clear()
+
+    def flush(self):
+        for table, rows in self._pending.items():
+            if rows:
+                self.conn.executemany(self._sql[table], rows)
+                rows.clear()
+
+    def add_unique(self, data, json_file=None, digest=None):
+        """Registra uma sequência única (dict no formato dos JSONs de Unique) e suas sample_counts."""
+        sequence = data["sequence"]
+        digest = digest or sequence_digest(sequence)
+        self._add("uniques", (digest, sequence, len(sequence), data.get("ID"), json_file))
+        for sample, count in (data.get("sample_counts") or {}).items():
+            self._add("sample_counts", (digest, str(sample), "cleaned", count))
+        if data.get("taxonomy") is not None:
+            self._add("taxonomy", (digest, data["taxonomy"], time.time()))
+        return digest
+
+    def add_sample_count(self, digest, sample, count, source="raw"):
+        self._add("sample_counts", (digest, str(sample), source, count))
+
+    def add_taxonomy(self, digest, taxonomy):
+        self._add("taxonomy", (digest, taxonomy, time.time()))
+
+
+def clear_uniques(conn):
+    """
+    Remove as sequências únicas e as contagens 'cleaned' (antes de uma nova agregação).
+    A taxonomia é mantida: é indexada por digest e continua válida para a mesma sequência.
+    Não faz commit; use dentro de um BulkLoader para trocar o conteúdo atomicamente.
+    """
+    conn.execute("DELETE FROM uniques")
+    conn.execute("DELETE FROM sample_counts WHERE source = 'cleaned'")
+
+
+def clear_sample_counts(conn, source="raw"):
+    """Remove as contagens de uma fonte. Não faz commit (ver clear_uniques)."""
+    conn.execute("DELETE FROM sample_counts WHERE source = ?", (source,))
+
+
+def load_uniques(conn, records):
+    """Carga em lote de (data, json_file); retorna o número de registros."""
+    n = 0
+    with BulkLoader(conn) as loader:
+        for data, json_file in records:
+            loader.add_unique(data, json_file)
+            n += 1
+    return n
+
+
+def load_sample_counts(conn, rows, source="raw"):
+    """Carga em lote de (digest, amostra, contagem); retorna o número de linhas."""
+    n = 0
+    with BulkLoader(conn) as loader:
+        for digest, sample, count in rows:
+            loader.add_sample_count(digest, sample, count, source)
+            n += 1
+    return n
+
+
+def update_taxonomy(conn, items):
+    """Grava (digest, taxonomia) em uma única transação; retorna o número de linhas."""
+    n = 0
+    with BulkLoader(conn) as loader:
+        for digest, taxonomy in items:
+            loader.add_taxonomy(digest, taxonomy)
+            n += 1
+    return n
+
+
+def index_unique_directory(conn, unique_dir="assets/Collections/Unique"):
+    """
+    (Re)indexa todos os JSONs de sequências únicas de um diretório: as únicas e contagens
+    'cleaned' anteriores são removidas na mesma transação da nova carga (ver clear_uniques).
+    Retorna o número de registros.
+    """
+    n = 0
+    with BulkLoader(conn) as loader:
+        clear_uniques(conn)
+        for filename in sorted(os.listdir(unique_dir)):
+            if filename.endswith(".json"):
+                with open(os.path.join(unique_dir, filename)) as f:
+                    loader.add_unique(json.load(f), filename)
+                n += 1
+    return n
+
+
+def taxonomy_by_digest(conn):
+    """Retorna {digest: taxonomia}."""
+    return dict(conn.execute("SELECT digest, taxonomy FROM taxonomy"))
+
+
+def samples_containing(conn, sequence, source=None):
+    """Amostras que contêm a sequência: lista de (amostra, source, contagem)."""
+    sql = "SELECT sample, source, count FROM sample_counts WHERE digest = ? AND count > 0"
+    params = [sequence_digest(sequence)]
+    if source:
+        sql += " AND source = ?"
+        params.append(source)
+    return conn.execute(sql + " ORDER BY sample, source", params).fetchall()
+
+
+def uniques_by_taxon(conn, taxon):
+    """Sequências únicas cuja taxonomia contém `taxon`: lista de (digest, id, taxonomia, sequência)."""
+    return conn.execute(
+        "SELECT u.digest, u.id, t.taxonomy, u.sequence FROM taxonomy t "
+        "JOIN uniques u ON u.digest = t.digest WHERE t.taxonomy LIKE ? ORDER BY u.id",
+        (f"%{taxon}%",),
+    ).fetchall()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Consulta/indexação do banco SQLite de sequências únicas.")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_index = sub.add_parser("index", help="Indexa os JSONs de um diretório Unique.")
+    p_index.add_argument("unique_dir", nargs="?", default="assets/Collections/Unique")
+    p_seq = sub.add_parser("sequence", help="Quais amostras contêm esta sequência.")
+    p_seq.add_argument("sequence")
+    p_tax = sub.add_parser("taxon", help="Sequências únicas atribuídas a um táxon.")
+    p_tax.add_argument("taxon")
+    a = parser.parse_args()
+
+    connection = connect(a.db)
+    if a.command == "index":
+        print(f"[INFO] {index_unique_directory(connection, a.unique_dir)} sequências únicas indexadas em {a.db}")
+    elif a.command == "sequence":
+        for sample, source, count in samples_containing(connection, a.sequence):
+            print(f"{sample}\t{source}\t{count}")
+    else:
+        for digest, seq_id, taxonomy, sequence in uniques_by_taxon(connection, a.taxon):
+            print(f"{seq_id}\t{taxonomy}\t{len(sequence)}")
+    connection.close()
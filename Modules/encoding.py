@@ -0,0 +1,240 @@
+# Modules/encoding.py
+
+"""
+encoding.py
+Codificação compacta de sequências biológicas para coleções em memória.
+Inclui:
+ - Empacotamento 2-bit (A=0, C=1, G=2, T=3) com máscara de exceções (N e demais símbolos)
+ - PackedSequence: sequência empacotada com hash, igualdade e extração de k-mers sem decodificar
+ - SequenceArena: arena contígua (bytearray + offsets) para grandes listas de sequências
+ - sequence_digest: identificador estável (blake2b) de uma sequência
+
+Formato do blob (bytes):
+    <uint32 tamanho> <uint32 nº de trechos minúsculos> <uint32 nº de trechos de exceção>
+    <bases 2-bit> <trechos minúsculos: uint32 início + uint32 tamanho>
+    <trechos de exceção: uint32 início + uint32 tamanho + uint8 nº de bytes + símbolo UTF-8>
+Minúsculas (soft-masking) e corridas de um mesmo símbolo fora de ACGT (ex.: NNNN) ocupam
+um registro por trecho, não por base. Um blob é um objeto `bytes` comum, então pode ser
+usado diretamente como chave de dict/Counter.
+"""
+
+import hashlib
+import re
+import struct
+from array import array
+
+_HEADER = struct.Struct("<III")
+_CASE_RUN = struct.Struct("<II")
+_EXCEPTION_RUN = struct.Struct("<IIB")
+
+_TO_DIGITS = str.maketrans("ACGT", "0123")
+_FROM_DIGITS = "ACGT"
+_ASCII_UPPER = str.maketrans("abcdefghijklmnopqrstuvwxyz", "ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+_LOWER_RUN = re.compile(r"[a-z]+")
+_NON_ACGT_RUN = re.compile(r"([^ACGT])\1*")
+_NON_ACGT = re.compile(r"[^ACGT]")
+
+
+def _packed_size(length):
+    return (2 * length + 7) // 8
+
+
+def encode_sequence(sequence):
+    """
+    Codifica uma sequência (str) no blob compacto.
+    Minúsculas ASCII viram maiúsculas + trechos de caixa; símbolos fora de ACGT (N, IUPAC,
+    qualquer caractere Unicode) são gravados como 'A' no bloco 2-bit e preservados em
+    trechos de exceção, então a decodificação é sempre sem perdas.
+    """
+    length = len(sequence)
+    case_runs = [(m.start(), m.end() - m.start()) for m in _LOWER_RUN.finditer(sequence)]
+    if case_runs:
+        sequence = sequence.translate(_ASCII_UPPER)
+    exception_runs = [(m.start(), m.end() - m.start(), m.group(1))
+                      for m in _NON_ACGT_RUN.finditer(sequence)]
+    if exception_runs:
+        sequence = _NON_ACGT.sub("A", sequence)
+    if length:
+        packed = int(sequence.translate(_TO_DIGITS), 4).to_bytes(_packed_size(length), "big")
+    else:
+        packed = b""
+    parts = [_HEADER.pack(length, len(case_runs), len(exception_runs)), packed]
+    for start, size in case_runs:
+        parts.append(_CASE_RUN.pack(start, size))
+    for start, size, char in exception_runs:
+        raw = char.encode("utf-8", "surrogatepass")
+        parts.append(_EXCEPTION_RUN.pack(start, size, len(raw)))
+        parts.append(raw)
+    return b"".join(parts)
+
+
+def _split_blob(blob):
+    """Retorna (tamanho, bases 2-bit, trechos minúsculos, trechos de exceção)."""
+    length, n_case, n_exc = _HEADER.unpack_from(blob, 0)
+    offset = _HEADER.size + _packed_size(length)
+    packed = blob[_HEADER.size:offset]
+    case_runs = []
+    for _ in range(n_case):
+        case_runs.append(_CASE_RUN.unpack_from(blob, offset))
+        offset += _CASE_RUN.size
+    exception_runs = []
+    for _ in range(n_exc):
+        start, size, n_bytes = _EXCEPTION_RUN.unpack_from(blob, offset)
+        offset += _EXCEPTION_RUN.size
+        exception_runs.append((start, size, blob[offset:offset + n_bytes].decode("utf-8", "surrogatepass")))
+        offset += n_bytes
+    return length, packed, case_runs, exception_runs
+
+
+def decode_sequence(blob):
+    """
+    Decodifica um blob produzido por encode_sequence de volta para str.
+    """
+    length, packed, case_runs, exception_runs = _split_blob(blob)
+    if not length:
+        return ""
+    digits = _to_base4(int.from_bytes(packed, "big"), length)
+    sequence = digits.translate(str.maketrans("0123", _FROM_DIGITS))
+    if exception_runs or case_runs:
+        chars = list(sequence)
+        for start, size, char in exception_runs:
+            chars[start:start + size] = char * size
+        for start, size in case_runs:
+            chars[start:start + size] = "".join(chars[start:start + size]).lower()
+        sequence = "".join(chars)
+    return sequence
+
+
+def _to_base4(value, length):
+    # Via hexadecimal: cada dígito hex equivale a dois dígitos em base 4.
+    hex_str = format(value, "x").zfill((length + 1) // 2)
+    pairs = "".join(_HEX_TO_BASE4[c] for c in hex_str)
+    return pairs[len(pairs) - length:]
+
+
+_HEX_TO_BASE4 = {format(i, "x"): f"{i >> 2}{i & 3}" for i in range(16)}
+
+
+def sequence_digest(sequence):
+    """
+    Digest estável (hex, 128 bits) da sequência, usado para particionar e ordenar
+    sequências de forma idêntica em processos e máquinas diferentes.
+    """
+    return hashlib.blake2b(sequence.encode("ascii", "replace"), digest_size=16).hexdigest()
+
+
+def sequence_length(blob):
+    """Retorna o tamanho (em bases) de um blob sem decodificá-lo."""
+    return _HEADER.unpack_from(blob, 0)[0]
+
+
+class PackedSequence:
+    """
+    Sequência empacotada em 2-bit com máscara de exceções.
+    Hash e igualdade operam sobre o blob (compare com PackedSequence.from_str(seq), não
+    com str); k-mers são extraídos direto dos bits, sem distinção de caixa.
+    """
+    __slots__ = ("blob",)
+
+    def __init__(self, blob):
+        self.blob = bytes(blob)
+
+    @classmethod
+    def from_str(cls, sequence):
+        return cls(encode_sequence(sequence))
+
+    def __len__(self):
+        return sequence_length(self.blob)
+
+    def __hash__(self):
+        return hash(self.blob)
+
+    def __eq__(self, other):
+        if isinstance(other, PackedSequence):
+            return self.blob == other.blob
+        return NotImplemented
+
+    def __str__(self):
+        return decode_sequence(self.blob)
+
+    def __repr__(self):
+        return f"PackedSequence(len={len(self)})"
+
+    @property
+    def nbytes(self):
+        return len(self.blob)
+
+    def exception_positions(self):
+        """Posições com símbolos fora de ACGT/acgt (ex.: N)."""
+        exception_runs = _split_blob(self.blob)[3]
+        return [pos for start, size, _ in exception_runs for pos in range(start, start + size)]
+
+    def kmers(self, k):
+        """
+        Gera (posição, código) para cada k-mer sem exceções, onde código é o inteiro
+        de 2k bits do k-mer (A=0, C=1, G=2, T=3; primeira base nos bits mais altos).
+        """
+        length, packed, _, exception_runs = _split_blob(self.blob)
+        if k <= 0 or k > length:
+            return
+        value = int.from_bytes(packed, "big")
+        mask = (1 << (2 * k)) - 1
+        blocked = set()
+        for start, size, _ in exception_runs:
+            blocked.update(range(max(0, start - k + 1), start + size))
+        for i in range(length - k + 1):
+            if i in blocked:
+                continue
+            yield i, (value >> (2 * (length - i - k))) & mask
+
+
+def decode_kmer(code, k):
+    """Converte o código inteiro de um k-mer de volta para str."""
+    return "".join(_FROM_DIGITS[(code >> (2 * (k - 1 - i))) & 3] for i in range(k))
+
+
+class SequenceArena:
+    """
+    Armazena muitas sequências codificadas em um único bytearray contíguo com offsets,
+    evitando o overhead de um objeto Python por sequência.
+    """
+
+    def __init__(self):
+        self._data = bytearray()
+        self._offsets = array("Q", [0])
+
+    def append(self, sequence):
+        """Adiciona uma sequência (str) e retorna seu índice."""
+        self._data += encode_sequence(sequence)
+        self._offsets.append(len(self._data))
+        return len(self._offsets) - 2
+
+    def extend(self, sequences):
+        for seq in sequences:
+            self.append(seq)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def blob(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Índice fora da arena.")
+        return bytes(self._data[self._offsets[index]:self._offsets[index + 1]])
+
+    def __getitem__(self, index):
+        return PackedSequence(self.blob(index))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def sequences(self):
+        """Itera as sequências decodificadas (str)."""
+        for i in range(len(self)):
+            yield decode_sequence(self.blob(i))
+
+    @property
+    def nbytes(self):
+        return len(self._data) + self._offsets.itemsize * len(self._offsets)
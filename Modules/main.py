@@ -5,13 +5,16 @@ import sys
 
 from Modules.check import find_valid_fastq_files
 from Modules.quality import (
-    extract_fastq_sequences_and_qualities_with_ids,
+    iter_fastq_records,
     extract_fasta_sequences_with_ids,
     QualityCutter,
-    export_cut_sequences_to_json,
+    export_cut_records_to_json,
     export_fasta_sequences_to_json,
 )
 from Modules.unique import aggregate_unique_sequences
+from Modules.metrics import PipelineMetrics
+from Modules.database import DEFAULT_DB_PATH
+from Modules.report import QCAccumulator, save_aggregates, load_aggregates, render_qc_report
 from Modules.search import (
     add_taxonomy_to_unique_jsons,
     count_unique_sequences_in_raw_fast,
@@ -19,61 +22,161 @@ from Modules.search import (
     parse_taxonomy_from_description,
 )
 
-def main():
-    # --- INPUT/VALIDAÇÃO ---
-    input_path = sys.argv[1] if len(sys.argv) > 1 else input(
-        "\nInforme o caminho do arquivo, pasta ou pasta com subpastas de arquivos FASTQ/FASTA: ").strip()
-    _ = find_valid_fastq_files(input_path)  # Copia arquivos válidos para Raw_sequences
+RAW_SEQUENCES_ROOT = os.path.join("assets", "Collections", "Raw_sequences")
+QC_ROOT = os.path.join("assets", "Collections", "QC")
+BLAST_DB_PATH = "/caminho/para/seu/banco"  # Ajuste conforme seu sistema!
 
-    # --- LIMPEZA/EXPORTAÇÃO ---
-    raw_sequences_root = os.path.join("assets", "Collections", "Raw_sequences")
-    for amostra in os.listdir(raw_sequences_root):
-        amostra_dir = os.path.join(raw_sequences_root, amostra)
-        if not os.path.isdir(amostra_dir):
-            continue
-        for arquivo in os.listdir(amostra_dir):
-            input_file = os.path.join(amostra_dir, arquivo)
-            if arquivo.lower().endswith(('.fasta', '.fa')):
-                # Apenas extração e exportação, sem corte de qualidade!
+
+def blast_taxonomy_func(blast_db_path=BLAST_DB_PATH):
+    """Função de classificação padrão: BLAST local + parse da descrição do melhor hit."""
+    return lambda seq: blast_taxonomy_search_local(seq, blast_db_path, parse_func=parse_taxonomy_from_description)
+
+
+def validate_input(input_path, metrics):
+    """Valida a entrada e copia os FASTQ válidos para Raw_sequences; retorna {amostra: [arquivos]}."""
+    with metrics.stage("validate") as st:
+        valid = find_valid_fastq_files(input_path)  # Copia arquivos válidos para Raw_sequences
+        st.add(records=sum(len(v) for v in valid.values()))
+    return valid
+
+
+def clean_sample(amostra, metrics, qc_report=False, qc_root=QC_ROOT):
+    """
+    Limpeza/exportação de uma amostra de Raw_sequences: FASTA só é exportado; FASTQ passa
+    pela escolha do cutoff (1ª passada) e pelo corte + exportação em streaming (2ª passada).
+    Com qc_report, salva também os agregados de QC da amostra em qc_root/{amostra}.
+    """
+    amostra_dir = os.path.join(RAW_SEQUENCES_ROOT, amostra)
+    qc = QCAccumulator() if qc_report else None
+    for arquivo in os.listdir(amostra_dir):
+        input_file = os.path.join(amostra_dir, arquivo)
+        file_size = os.path.getsize(input_file)
+        if arquivo.lower().endswith(('.fasta', '.fa')):
+            # Apenas extração e exportação, sem corte de qualidade!
+            with metrics.stage("parse", amostra) as st:
                 ids, seqs = extract_fasta_sequences_with_ids(input_file)
+                st.add(records=len(ids), bytes_read=file_size)
+            if qc is not None:
+                with metrics.stage("qc_aggregate", amostra) as st:
+                    for seq in seqs:
+                        qc.add(seq)
+                    st.add(records=len(seqs))
+            with metrics.stage("export_json", amostra) as st:
                 export_fasta_sequences_to_json(ids, seqs, input_file, sample_name=amostra)
-            elif arquivo.lower().endswith(('.fastq', '.fq', '.fastq.gz')):
-                ids, seqs, qs = extract_fastq_sequences_and_qualities_with_ids(input_file)
-                # Se não houver scores (para garantir robustez)
-                if not qs or not isinstance(qs[0], list) or qs[0] is None:
-                    print(f"[INFO] Pulando corte de qualidade: {arquivo} não contém scores válidos.")
-                    continue
-                cutter = QualityCutter()
-                try:
-                    cutter.analyze_and_set_cutoff(qs)
-                except Exception as e:
-                    print(f"[ERRO] Corte de qualidade falhou para {arquivo}: {str(e)} – Pulando este arquivo.")
-                    continue
-                seqs_filt, qs_filt = cutter.cut_low_quality_bases(seqs, qs)
-                ids_filt = [
-                    i for i, s, q in zip(ids, seqs, qs)
-                    if len(''.join([base for base, score in zip(s, q) if score >= cutter.cutoff])) > 0
-                ]
-                export_cut_sequences_to_json(ids_filt, seqs_filt, qs_filt, input_file, output_dir=None, sample_name=amostra)
+                st.add(records=len(ids))
+        elif arquivo.lower().endswith(('.fastq', '.fq', '.fastq.gz')):
+            # 1ª passada: histograma de qualidade (memória fixa) para escolher o cutoff
+            cutter = QualityCutter()
+            try:
+                with metrics.stage("cutoff", amostra) as st:
+                    def first_pass():
+                        for _, seq, q in iter_fastq_records(input_file):
+                            if qc is not None:
+                                qc.add(seq, q)
+                            yield q
+                    cut_report = cutter.estimate_cutoff(first_pass())
+                    st.add(records=cut_report['reads'], bytes_read=file_size)
+            except Exception as e:
+                # Sem scores válidos (ex.: arquivo vazio) ou erro de leitura
+                print(f"[ERRO] Corte de qualidade falhou para {arquivo}: {str(e)} – Pulando este arquivo.")
+                continue
+            # 2ª passada: corte e exportação em streaming, leitura a leitura
+            with metrics.stage("quality_cut_export", amostra) as st:
+                written = export_cut_records_to_json(
+                    cutter.iter_cut_records(iter_fastq_records(input_file)),
+                    input_file, sample_name=amostra)
+                st.add(records=written, bytes_read=file_size)
+    if qc is not None:
+        save_aggregates(qc.to_dict(), os.path.join(qc_root, amostra))
+
+
+def run_global_stages(metrics, memory_budget_mb=None, workers=None, qc_report=False, qc_root=QC_ROOT,
+                      db_path=DEFAULT_DB_PATH, taxonomy_func=None, mp_context=None):
+    """
+    Etapas sobre o conjunto de todas as amostras já limpas: relatório de QC, agregação de
+    únicas, busca taxonômica e matriz de abundância. Retorna o DataFrame da matriz.
+    mp_context é repassado aos pools de processos (use "spawn" a partir de processos com threads).
+    """
+    # --- RELATÓRIO DE QC (Agg, PNG/SVG + HTML, amostras em paralelo) ---
+    if qc_report:
+        with metrics.stage("qc_report") as st:
+            aggregates = load_aggregates(qc_root)
+            render_qc_report(aggregates, os.path.join(qc_root, "report"), workers=workers,
+                             mp_context=mp_context)
+            st.add(records=len(aggregates))
 
     # --- AGREGAÇÃO DE SEQUÊNCIAS ÚNICAS ---
-    aggregate_unique_sequences(
-        input_directory="assets/Collections/Sequences_cleaned",
-        output_directory="assets/Collections/Unique"
-    )
+    with metrics.stage("aggregate_unique") as st:
+        unique_count = aggregate_unique_sequences(
+            input_directory="assets/Collections/Sequences_cleaned",
+            output_directory="assets/Collections/Unique",
+            memory_budget_mb=memory_budget_mb,
+            workers=workers or 1,
+            db_path=db_path,
+            mp_context=mp_context
+        )
+        st.add(records=unique_count)
 
     # --- BUSCA TAXONÔMICA ---
-    blast_db_path = "/caminho/para/seu/banco"  # Ajuste conforme seu sistema!
-    add_taxonomy_to_unique_jsons(
-        unique_dir="assets/Collections/Unique",
-        taxonomy_func=lambda seq: blast_taxonomy_search_local(seq, blast_db_path, parse_func=parse_taxonomy_from_description)
-    )
+    with metrics.stage("taxonomy_blast") as st:
+        classified = add_taxonomy_to_unique_jsons(
+            unique_dir="assets/Collections/Unique",
+            taxonomy_func=taxonomy_func if taxonomy_func is not None else blast_taxonomy_func(),
+            db_path=db_path,
+            workers=workers or 1
+        )
+        st.add(records=classified)
 
     # --- MATRIZ/CONTAGEM DE ABUNDÂNCIA ---
-    df_abundancia = count_unique_sequences_in_raw_fast(
-        unique_dir="assets/Collections/Unique",
-        raw_dir="assets/Collections/Raw_sequences"
-    )
+    with metrics.stage("abundance_matrix") as st:
+        df_abundancia = count_unique_sequences_in_raw_fast(
+            unique_dir="assets/Collections/Unique",
+            raw_dir="assets/Collections/Raw_sequences",
+            db_path=db_path
+        )
+        st.add(records=len(df_abundancia))
+    return df_abundancia
+
+
+def run_pipeline(input_path, metrics=None, memory_budget_mb=None, workers=None, qc_report=False,
+                 db_path=DEFAULT_DB_PATH, taxonomy_func=None):
+    """
+    Pipeline completo para uma entrada (arquivo, pasta ou pasta com subpastas): validação,
+    limpeza de todas as amostras em Raw_sequences e etapas globais. Retorna (metrics, DataFrame).
+    """
+    metrics = metrics or PipelineMetrics()
+    validate_input(input_path, metrics)
+
+    # --- LIMPEZA/EXPORTAÇÃO ---
+    for amostra in os.listdir(RAW_SEQUENCES_ROOT):
+        if os.path.isdir(os.path.join(RAW_SEQUENCES_ROOT, amostra)):
+            clean_sample(amostra, metrics, qc_report)
+
+    df_abundancia = run_global_stages(metrics, memory_budget_mb, workers, qc_report,
+                                      db_path=db_path, taxonomy_func=taxonomy_func)
+    return metrics, df_abundancia
+
+
+def main():
+    # Opções: --profile (cProfile por etapa), --trace-memory (tracemalloc por etapa)
+    # --qc-report (relatório de QC headless em assets/Collections/QC),
+    # --memory-budget=MB (deduplicação em disco) e --workers=N (processos paralelos)
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    flags = {a for a in sys.argv[1:] if a.startswith("--") and "=" not in a}
+    options = dict(a[2:].split("=", 1) for a in sys.argv[1:] if a.startswith("--") and "=" in a)
+    memory_budget_mb = float(options["memory-budget"]) if "memory-budget" in options else None
+    workers = int(options["workers"]) if "workers" in options else None
+    metrics = PipelineMetrics(profile="--profile" in flags, trace_memory="--trace-memory" in flags)
+
+    # --- INPUT/VALIDAÇÃO ---
+    input_path = args[0] if args else input(
+        "\nInforme o caminho do arquivo, pasta ou pasta com subpastas de arquivos FASTQ/FASTA: ").strip()
+    run_pipeline(input_path, metrics, memory_budget_mb, workers, qc_report="--qc-report" in flags)
+
+    # --- RELATÓRIO DE MÉTRICAS (ao lado de unique_occurrence_matrix.csv) ---
+    metrics.print_summary()
+    json_report, prom_report = metrics.write_report(os.path.join("assets", "Collections"))
+    print(f"[INFO] Métricas da execução salvas em: {json_report} e {prom_report}")
 
     print(f"\n[SUCCESS] Pipeline completo: dados organizados, limpos, únicas salvas, taxonomia atribuída, matriz de abundância pronta!")
 
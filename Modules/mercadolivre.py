@@ -0,0 +1,397 @@
+# Modules/mercadolivre.py
+
+"""
+mercadolivre.py
+Coleta de preços em listagens do Mercado Livre (ex.: notebooks), reutilizável por scripts.
+
+ - Paginação: as páginas de uma busca são geradas pelo deslocamento (_Desde_N) e baixadas em
+   paralelo, com limite de concorrência, por uma requests.Session com pool de conexões e retry.
+ - Parsing em uma única passada por página, cada anúncio (card) já com título, link e preços
+   alinhados: selectolax se instalado, senão lxml, senão html.parser (biblioteca padrão).
+ - Limpeza em memória (limpa_preco / is_produto_real) direto para um DataFrame, sem CSV.
+ - Modo offline: serve_fixtures sobe um servidor local com páginas HTML salvas
+   (benchmarks/fixtures/mercadolivre) no lugar do site.
+
+Uso:
+    python -m Modules.mercadolivre notebook --paginas 3 --concurrency 4 --csv notebooks.csv
+    python -m Modules.mercadolivre notebook --paginas 2 --offline
+"""
+
+from Install.Libs.LIB import MODULES
+os = MODULES["os"]
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+
+BASE_URL = "https://lista.mercadolivre.com.br"
+HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
+ITENS_POR_PAGINA = 48
+BACKENDS = ("selectolax", "lxml", "html.parser")
+COLUNAS = ["titulo", "link", "preco_anterior", "preco_atual", "preco_parcelado"]
+COLUNAS_PRECO = ["preco_anterior", "preco_atual", "preco_parcelado"]
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            "benchmarks", "fixtures", "mercadolivre")
+
+# Marcas que representam notebooks reais
+MARCAS_NOTEBOOK = ['dell', 'lenovo', 'hp', 'asus', 'acer', 'apple', 'positivo', 'samsung', 'vaio']
+# Agrupadores genéricos e palavras-chave de filtros da página
+AGRUPADORES = ['mostrar mais', 'novo', 'usado', 'recondicionado', 'caixa aberta',
+               'até r$', 'mais de', 'parcelamento', 'grátis', 'local', 'internacional',
+               'android', 'windows', 'linux', 'macos', 'google chrome', 'freedos', 'full',
+               'somente lojas', 'lojas oficiais', 'core', 'celeron', 'ryzen', 'intel']
+
+
+# --- Limpeza ---
+
+def limpa_preco(v):
+    """'3.299,90' -> 3299.9; vazio ou inválido -> None."""
+    if v is None:
+        return None
+    v = str(v).replace('.', '').replace(',', '.')
+    try:
+        return float(v)
+    except ValueError:
+        return None
+
+def is_produto_real(titulo):
+    tit = str(titulo).lower()
+    if any(a in tit for a in AGRUPADORES):
+        return False
+    # Mantém apenas se for uma das marcas de notebook
+    return any(marca in tit for marca in MARCAS_NOTEBOOK)
+
+def to_dataframe(itens, filtrar=True):
+    """
+    Monta o DataFrame (COLUNAS) a partir dos anúncios, com os preços já convertidos para float.
+    Com filtrar=True mantém só os produtos reais (is_produto_real).
+    """
+    import pandas as pd  # importado sob demanda, como no restante do projeto
+    df = pd.DataFrame(itens, columns=COLUNAS)
+    for col in COLUNAS_PRECO:
+        df[col] = df[col].map(limpa_preco)
+    if filtrar:
+        df = df[df['titulo'].map(is_produto_real)]
+    return df.reset_index(drop=True)
+
+
+# --- Parsing (uma passada por página) ---
+
+def _preco(fracao, centavos):
+    if not fracao:
+        return ""
+    return f"{fracao},{centavos}" if centavos else fracao
+
+def _novo_item():
+    return {"titulo": "", "link": "", "preco_anterior": "", "preco_atual": "", "preco_parcelado": ""}
+
+def _parse_selectolax(html):
+    try:
+        from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+    except ImportError:  # selectolax < 0.3.13: só o backend Modest
+        from selectolax.parser import HTMLParser as SelectolaxParser
+
+    def valor(node):
+        if node is None:
+            return ""
+        fracao = node.css_first(".andes-money-amount__fraction")
+        centavos = node.css_first(".andes-money-amount__cents")
+        return _preco(fracao.text(strip=True) if fracao else "", centavos.text(strip=True) if centavos else "")
+
+    itens = []
+    for card in SelectolaxParser(html).css("li.ui-search-layout__item"):
+        item = _novo_item()
+        titulo = card.css_first(".poly-component__title, .ui-search-item__title")
+        if titulo is not None:
+            item["titulo"] = titulo.text(strip=True)
+            link = titulo if titulo.tag == "a" else titulo.css_first("a")
+            item["link"] = (link.attributes.get("href") or "") if link is not None else ""
+        item["preco_anterior"] = valor(card.css_first(".poly-component__price .andes-money-amount--previous"))
+        item["preco_atual"] = valor(card.css_first(".poly-component__price .poly-price__current"))
+        item["preco_parcelado"] = valor(card.css_first(".poly-component__price .poly-price__installments"))
+        itens.append(item)
+    return itens
+
+def _xp_classe(classe):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {classe} ')"
+
+def _parse_lxml(html):
+    import lxml.html
+
+    def valor(nodes):
+        if not nodes:
+            return ""
+        fracao = nodes[0].xpath(f".//*[{_xp_classe('andes-money-amount__fraction')}]")
+        centavos = nodes[0].xpath(f".//*[{_xp_classe('andes-money-amount__cents')}]")
+        return _preco(fracao[0].text_content().strip() if fracao else "",
+                      centavos[0].text_content().strip() if centavos else "")
+
+    preco = f".//*[{_xp_classe('poly-component__price')}]//*"
+    itens = []
+    for card in lxml.html.fromstring(html).xpath(f"//li[{_xp_classe('ui-search-layout__item')}]"):
+        item = _novo_item()
+        titulo = card.xpath(f".//*[{_xp_classe('poly-component__title')} or {_xp_classe('ui-search-item__title')}]")
+        if titulo:
+            item["titulo"] = titulo[0].text_content().strip()
+            link = titulo[0] if titulo[0].tag == "a" else next(iter(titulo[0].xpath(".//a")), None)
+            item["link"] = link.get("href", "") if link is not None else ""
+        item["preco_anterior"] = valor(card.xpath(f"{preco}[{_xp_classe('andes-money-amount--previous')}]"))
+        item["preco_atual"] = valor(card.xpath(f"{preco}[{_xp_classe('poly-price__current')}]"))
+        item["preco_parcelado"] = valor(card.xpath(f"{preco}[{_xp_classe('poly-price__installments')}]"))
+        itens.append(item)
+    return itens
+
+
+class _ListingParser(HTMLParser):
+    """
+    Parser de uma passada (biblioteca padrão): mantém a pilha de elementos abertos com os
+    papéis de cada um (card, título, tipo de preço, fração, centavos) e monta cada anúncio
+    ao fechar o seu card.
+    """
+    VOID = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+    PAPEIS = {
+        "ui-search-layout__item": "card",
+        "poly-component__title": "titulo",
+        "ui-search-item__title": "titulo",
+        "poly-component__price": "preco",
+        "andes-money-amount--previous": "preco_anterior",
+        "poly-price__current": "preco_atual",
+        "poly-price__installments": "preco_parcelado",
+        "andes-money-amount__fraction": "fracao",
+        "andes-money-amount__cents": "centavos",
+    }
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.itens = []
+        self._pilha = []  # (tag, papéis)
+        self._papeis = {}  # papel -> nº de elementos abertos com ele
+        self._item = None
+        self._partes = None
+
+    def _ativo(self, papel):
+        return self._papeis.get(papel, 0) > 0
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        papeis = {self.PAPEIS[c] for c in (attrs.get("class") or "").split() if c in self.PAPEIS}
+        if "card" in papeis and tag == "li":
+            self._item = _novo_item()
+            self._partes = {"titulo": [], "fracao": {}, "centavos": {}}
+        elif tag == "li":
+            papeis.discard("card")
+        if self._item is not None and tag == "a" and not self._item["link"] and \
+                ("titulo" in papeis or self._ativo("titulo")):
+            self._item["link"] = attrs.get("href") or ""
+        if tag in self.VOID:
+            return
+        self._pilha.append((tag, papeis))
+        for p in papeis:
+            self._papeis[p] = self._papeis.get(p, 0) + 1
+
+    def handle_endtag(self, tag):
+        if tag in self.VOID or not any(t == tag for t, _ in self._pilha):
+            return
+        # Fecha também elementos sem tag de fechamento dentro deste (HTML malformado)
+        while self._pilha:
+            t, papeis = self._pilha.pop()
+            for p in papeis:
+                self._papeis[p] -= 1
+            if "card" in papeis:
+                self._fecha_card()
+            if t == tag:
+                break
+
+    def handle_data(self, data):
+        if self._item is None:
+            return
+        if self._ativo("titulo"):
+            self._partes["titulo"].append(data)
+        if not self._ativo("preco"):
+            return
+        for tipo in ("preco_anterior", "preco_atual", "preco_parcelado"):
+            if self._ativo(tipo):
+                for parte in ("fracao", "centavos"):
+                    if self._ativo(parte):
+                        # Primeiro valor de cada tipo de preço
+                        self._partes[parte].setdefault(tipo, data.strip())
+                break
+
+    def _fecha_card(self):
+        item, partes = self._item, self._partes
+        item["titulo"] = " ".join("".join(partes["titulo"]).split())
+        for tipo in ("preco_anterior", "preco_atual", "preco_parcelado"):
+            item[tipo] = _preco(partes["fracao"].get(tipo, ""), partes["centavos"].get(tipo, ""))
+        self.itens.append(item)
+        self._item = self._partes = None
+
+def _parse_stdlib(html):
+    parser = _ListingParser()
+    parser.feed(html)
+    parser.close()
+    return parser.itens
+
+_PARSERS = {"selectolax": _parse_selectolax, "lxml": _parse_lxml, "html.parser": _parse_stdlib}
+_MODULOS_BACKEND = {"selectolax": "selectolax", "lxml": "lxml.html", "html.parser": "html.parser"}
+
+def available_backends():
+    """Backends de parsing disponíveis neste ambiente, em ordem de preferência."""
+    import importlib.util
+    disponiveis = []
+    for nome in BACKENDS:
+        try:
+            if importlib.util.find_spec(_MODULOS_BACKEND[nome]) is not None:
+                disponiveis.append(nome)
+        except ModuleNotFoundError:
+            continue
+    return disponiveis
+
+def parse_listing(html, backend=None):
+    """
+    Extrai os anúncios de uma página de listagem.
+    Retorna lista de dicts {titulo, link, preco_anterior, preco_atual, preco_parcelado}
+    (preços como texto, ex. '3.299,90'; '' quando ausente).
+    """
+    if backend is None:
+        backend = available_backends()[0]
+    if backend not in _PARSERS:
+        raise ValueError(f"Backend de parsing inválido: '{backend}' (use {BACKENDS}).")
+    return _PARSERS[backend](html)
+
+
+# --- Download ---
+
+def page_url(termo, pagina=1, base_url=BASE_URL):
+    """URL da página `pagina` (1, 2, ...) da busca por `termo`."""
+    termo = termo.strip().replace(" ", "-")
+    if pagina <= 1:
+        return f"{base_url}/{termo}"
+    return f"{base_url}/{termo}_Desde_{(pagina - 1) * ITENS_POR_PAGINA + 1}_NoIndex_True"
+
+def make_session(concurrency=4, retries=2):
+    """requests.Session com pool de `concurrency` conexões por host e retry com backoff."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency,
+                          max_retries=Retry(total=retries, backoff_factor=0.5,
+                                            status_forcelist=(429, 500, 502, 503, 504)))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def fetch_pages(urls, session=None, concurrency=4, timeout=20):
+    """
+    Baixa as URLs em paralelo (no máximo `concurrency` ao mesmo tempo) reaproveitando as
+    conexões da sessão. Retorna o HTML de cada URL, na mesma ordem (None em caso de falha).
+    """
+    session = session or make_session(concurrency)
+
+    def fetch(url):
+        try:
+            response = session.get(url, timeout=timeout)
+        except Exception as e:
+            print(f"[ERRO] Falha ao baixar {url}: {e}")
+            return None
+        if response.status_code != 200:
+            print(f"[AVISO] {url} respondeu {response.status_code}. Ignorando.")
+            return None
+        return response.text
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        return list(executor.map(fetch, urls))
+
+def scrape_items(termo="notebook", paginas=1, concurrency=4, base_url=BASE_URL, backend=None, session=None):
+    """
+    Baixa e interpreta `paginas` páginas da busca; retorna a lista de anúncios, sem repetir
+    links (anúncios patrocinados se repetem entre páginas).
+    """
+    urls = [page_url(termo, p, base_url) for p in range(1, paginas + 1)]
+    htmls = fetch_pages(urls, session, concurrency)
+    backend = backend or available_backends()[0]
+    itens = []
+    vistos = set()
+    for url, html in zip(urls, htmls):
+        if html is None:
+            continue
+        pagina = parse_listing(html, backend)
+        if not pagina:
+            print(f"[AVISO] Nenhum anúncio encontrado em {url}.")
+        for item in pagina:
+            chave = item["link"] or item["titulo"]
+            if chave in vistos:
+                continue
+            vistos.add(chave)
+            itens.append(item)
+    print(f"[INFO] {len(itens)} anúncios em {sum(h is not None for h in htmls)}/{len(urls)} páginas ({backend}).")
+    return itens
+
+def scrape(termo="notebook", paginas=1, concurrency=4, base_url=BASE_URL, backend=None, filtrar=True, session=None):
+    """Coleta completa: download paginado + parsing + limpeza, direto em um DataFrame."""
+    return to_dataframe(scrape_items(termo, paginas, concurrency, base_url, backend, session), filtrar)
+
+
+# --- Modo offline ---
+
+def serve_fixtures(fixtures_dir=FIXTURES_DIR, host="127.0.0.1", port=0):
+    """
+    Sobe (em uma thread) um servidor local que responde /<nome> com fixtures_dir/<nome>.html,
+    no lugar de lista.mercadolivre.com.br. Retorna (servidor, base_url); encerre com
+    servidor.shutdown().
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            nome = self.path.split("?")[0].strip("/")
+            path = os.path.join(fixtures_dir, f"{nome}.html")
+            if not nome or "/" in nome or not os.path.isfile(path):
+                self.send_error(404)
+                return
+            with open(path, "rb") as f:
+                body = f.read()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), FixtureHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Coleta de preços do Mercado Livre.")
+    parser.add_argument("termo", nargs="?", default="notebook")
+    parser.add_argument("--paginas", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--backend", choices=BACKENDS, default=None)
+    parser.add_argument("--sem-filtro", action="store_true", help="Mantém todos os anúncios.")
+    parser.add_argument("--csv", default=None, help="Salva o resultado neste CSV.")
+    parser.add_argument("--offline", action="store_true", help="Usa as páginas salvas em FIXTURES_DIR.")
+    a = parser.parse_args()
+
+    servidor = None
+    base = BASE_URL
+    if a.offline:
+        servidor, base = serve_fixtures()
+        print(f"[INFO] Modo offline: {FIXTURES_DIR} servido em {base}")
+    try:
+        df = scrape(a.termo, a.paginas, a.concurrency, base, a.backend, filtrar=not a.sem_filtro)
+    finally:
+        if servidor is not None:
+            servidor.shutdown()
+    print(df.head())
+    if a.csv:
+        df.to_csv(a.csv, index=False)
+        print(f"[INFO] Arquivo salvo: {a.csv}")
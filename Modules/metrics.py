@@ -0,0 +1,269 @@
+# Modules/metrics.py
+
+"""
+metrics.py
+Instrumentação por etapa/amostra do pipeline.
+Inclui:
+ - Tempo de parede (wall) e de CPU por etapa (CPU da thread que roda a etapa; processos
+   filhos, como pools e o BLAST, não entram)
+ - Registros processados e registros/s
+ - Bytes lidos/escritos (contadores do processo em /proc/self/io + valores informados pela etapa)
+ - Pico de RSS do processo ao fim de cada etapa
+ - Ganchos opcionais de cProfile (um .prof por etapa) e tracemalloc (pico de memória Python por etapa)
+ - Relatório legível por máquina (JSON e texto no formato Prometheus)
+
+/proc/self/io, RSS e tracemalloc são do processo inteiro: com shared_process=True (várias
+execuções em threads do mesmo processo, como no serviço de Interface/interface.py) os bytes
+vêm só do que cada etapa informa e o tracemalloc fica desligado; o pico de RSS continua
+sendo o do processo.
+"""
+
+from Install.Libs.LIB import MODULES
+os = MODULES["os"]
+json = MODULES["json"]
+
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KiB; macOS em bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _io_counters():
+    """Retorna (bytes lidos, bytes escritos) do processo via /proc/self/io, ou (None, None)."""
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+class StageRecord:
+    """
+    Resultado de uma etapa. Dentro do bloco `with metrics.stage(...)` use add() para
+    informar registros processados e bytes lidos/escritos conhecidos pela etapa.
+    """
+    def __init__(self, name, sample=None):
+        self.name = name
+        self.sample = sample
+        self.runs = 1
+        self.records = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_rss_bytes = None
+        self.traced_peak_bytes = None
+        self.profile_path = None
+
+    def add(self, records=0, bytes_read=0, bytes_written=0):
+        self.records += records
+        self.bytes_read += bytes_read
+        self.bytes_written += bytes_written
+
+    @property
+    def records_per_second(self):
+        return self.records / self.wall_seconds if self.wall_seconds > 0 else 0.0
+
+    def to_dict(self):
+        return {
+            "stage": self.name,
+            "sample": self.sample,
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "records": self.records,
+            "records_per_second": self.records_per_second,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "peak_rss_bytes": self.peak_rss_bytes,
+            "traced_peak_bytes": self.traced_peak_bytes,
+            "profile_path": self.profile_path,
+        }
+
+
+class PipelineMetrics:
+    """
+    Coleta métricas das etapas do pipeline.
+
+    Args:
+        profile (bool): Se True, roda cProfile em cada etapa e salva .prof em profile_dir.
+        trace_memory (bool): Se True, usa tracemalloc para medir o pico de memória Python por etapa.
+        profile_dir (str): Diretório dos arquivos .prof.
+        listener (callable): Se definido, chamado como listener("start"|"end", record) em cada
+                             etapa (ex.: para transmitir o progresso de um job).
+        shared_process (bool): Outras execuções rodam em paralelo no mesmo processo; desliga
+                               as medidas que só valem para o processo inteiro (ver acima).
+    """
+    def __init__(self, profile=False, trace_memory=False, profile_dir=os.path.join("assets", "Collections", "profiles"),
+                 listener=None, shared_process=False):
+        self.profile = profile
+        self.shared_process = shared_process
+        self.trace_memory = trace_memory and not shared_process
+        self.profile_dir = profile_dir
+        self.listener = listener
+        self.stages = []
+        self._profile_runs = {}
+        self._started = time.time()
+        self._wall0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+
+    @contextmanager
+    def stage(self, name, sample=None):
+        record = StageRecord(name, sample)
+        profiler = None
+        tracemalloc = None
+        if self.trace_memory:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        if self.profile:
+            import cProfile
+            profiler = cProfile.Profile()
+        if self.listener is not None:
+            self.listener("start", record)
+        read0, written0 = (None, None) if self.shared_process else _io_counters()
+        wall0 = time.perf_counter()
+        cpu0 = time.thread_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            record.wall_seconds = time.perf_counter() - wall0
+            record.cpu_seconds = time.thread_time() - cpu0
+            read1, written1 = (None, None) if self.shared_process else _io_counters()
+            if read0 is not None and read1 is not None:
+                # Usa o maior entre o informado pela etapa e o medido no processo.
+                record.bytes_read = max(record.bytes_read, read1 - read0)
+                record.bytes_written = max(record.bytes_written, written1 - written0)
+            record.peak_rss_bytes = _peak_rss_bytes()
+            if tracemalloc is not None:
+                record.traced_peak_bytes = tracemalloc.get_traced_memory()[1]
+            if profiler is not None:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                suffix = f"_{_safe_name(sample)}" if sample else ""
+                # A mesma etapa roda uma vez por arquivo da amostra: numera os .prof repetidos
+                runs = self._profile_runs[(name, sample)] = self._profile_runs.get((name, sample), 0) + 1
+                if runs > 1:
+                    suffix += f"_{runs}"
+                record.profile_path = os.path.join(self.profile_dir, f"{_safe_name(name)}{suffix}.prof")
+                profiler.dump_stats(record.profile_path)
+            self.stages.append(record)
+            if self.listener is not None:
+                self.listener("end", record)
+
+    def to_dict(self):
+        return {
+            "started_at": self._started,
+            "total_wall_seconds": time.perf_counter() - self._wall0,
+            # Com shared_process, a CPU do processo inclui outras execuções: soma só as etapas.
+            "total_cpu_seconds": (sum(s.cpu_seconds for s in self.stages) if self.shared_process
+                                  else time.process_time() - self._cpu0),
+            "peak_rss_bytes": _peak_rss_bytes(),
+            "stages": [s.to_dict() for s in self.stages],
+        }
+
+    def aggregated_stages(self):
+        """
+        Soma as execuções repetidas de uma etapa (uma por arquivo da amostra) em um único
+        StageRecord por (etapa, amostra), na ordem da primeira execução. Os picos (RSS e
+        tracemalloc) ficam com o maior valor; `runs` guarda o número de execuções.
+        """
+        merged = {}
+        for s in self.stages:
+            key = (s.name, s.sample)
+            total = merged.get(key)
+            if total is None:
+                total = merged[key] = StageRecord(s.name, s.sample)
+                total.runs = 0
+            total.runs += 1
+            total.add(s.records, s.bytes_read, s.bytes_written)
+            total.wall_seconds += s.wall_seconds
+            total.cpu_seconds += s.cpu_seconds
+            for field in ("peak_rss_bytes", "traced_peak_bytes"):
+                value = getattr(s, field)
+                if value is not None:
+                    setattr(total, field, max(value, getattr(total, field) or 0))
+        return list(merged.values())
+
+    def to_prometheus(self):
+        """Serializa as métricas no formato de exposição texto do Prometheus."""
+        metrics = [
+            ("wall_seconds", "gauge", "Tempo de parede da etapa em segundos."),
+            ("cpu_seconds", "gauge", "Tempo de CPU da thread da etapa em segundos."),
+            ("records", "counter", "Registros processados pela etapa."),
+            ("records_per_second", "gauge", "Registros por segundo."),
+            ("bytes_read", "counter", "Bytes lidos pela etapa."),
+            ("bytes_written", "counter", "Bytes escritos pela etapa."),
+            ("peak_rss_bytes", "gauge", "Pico de RSS do processo ao fim da etapa."),
+            ("traced_peak_bytes", "gauge", "Pico de memória Python (tracemalloc) na etapa."),
+            ("runs", "counter", "Execuções da etapa (uma por arquivo da amostra)."),
+        ]
+        # Uma série por (etapa, amostra): rótulos repetidos são rejeitados pelo Prometheus
+        stages = self.aggregated_stages()
+        lines = []
+        for field, kind, help_text in metrics:
+            metric = f"pipeline_stage_{field}"
+            samples = []
+            for s in stages:
+                value = s.runs if field == "runs" else s.to_dict()[field]
+                if value is None:
+                    continue
+                labels = f'stage="{_escape_label(s.name)}",sample="{_escape_label(s.sample or "")}"'
+                samples.append(f"{metric}{{{labels}}} {value}")
+            if samples:
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} {kind}")
+                lines.extend(samples)
+        totals = self.to_dict()
+        lines.append("# HELP pipeline_total_wall_seconds Tempo de parede total da execução.")
+        lines.append("# TYPE pipeline_total_wall_seconds gauge")
+        lines.append(f"pipeline_total_wall_seconds {totals['total_wall_seconds']}")
+        if totals["peak_rss_bytes"] is not None:
+            lines.append("# HELP pipeline_peak_rss_bytes Pico de RSS da execução.")
+            lines.append("# TYPE pipeline_peak_rss_bytes gauge")
+            lines.append(f"pipeline_peak_rss_bytes {totals['peak_rss_bytes']}")
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, output_dir=os.path.join("assets", "Collections"), basename="run_metrics"):
+        """
+        Salva o relatório em output_dir/{basename}.json e output_dir/{basename}.prom.
+        Retorna os caminhos (json, prom).
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        json_path = os.path.join(output_dir, f"{basename}.json")
+        prom_path = os.path.join(output_dir, f"{basename}.prom")
+        with open(json_path, "w") as f:
+            json.dump(self.to_dict(), f, indent=4)
+        with open(prom_path, "w") as f:
+            f.write(self.to_prometheus())
+        return json_path, prom_path
+
+    def print_summary(self):
+        print("\n[METRICS] etapa / amostra: wall(s) cpu(s) registros reg/s")
+        for s in self.stages:
+            label = f"{s.name} / {s.sample}" if s.sample else s.name
+            print(f"  {label}: {s.wall_seconds:.3f} {s.cpu_seconds:.3f} {s.records} {s.records_per_second:.1f}")
+
+
+def _safe_name(value):
+    return "".join(c if c.isalnum() else "_" for c in str(value))
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
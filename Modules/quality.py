@@ -11,17 +11,23 @@ Inclui:
  - Distribuição de conteúdo das bases por posição
  - Extração/corte de sequências pelo score de qualidade (apenas para FASTQ)
  - Processamento de arquivos FASTA para JSONs individuais (sem scoring)
+
+Scores de qualidade são mantidos como Phred real em buffers uint8 (`bytes`), com o offset
+do arquivo (33 ou 64) detectado automaticamente. Na exportação, os scores de cada arquivo
+de origem vão para um único binário `.qual` (bytes crus) e cada JSON guarda apenas a
+referência (arquivo, offset, tamanho); load_quality relê o trecho sem parsing.
 """
 
 from Install.Libs.LIB import MODULES
 os = MODULES["os"]
 json = MODULES["json"]
 
-import numpy as np
-import matplotlib.pyplot as plt
 from collections import Counter
 import gzip
 
+# numpy e matplotlib são importados sob demanda (dentro das funções de análise/plot),
+# para que a limpeza headless não pague o custo de importação desses pacotes.
+
 def smart_open(file_path):
     """Abre arquivo texto padrão ou compactado (.gz) como texto."""
     if file_path.lower().endswith('.gz'):
@@ -29,29 +35,70 @@ def smart_open(file_path):
     else:
         return open(file_path, 'r')
 
+PHRED_OFFSETS = (33, 64)
+QUALITY_ENCODING = "phred_uint8"
+
+def detect_phred_offset(fastq_file_path, max_reads=1000):
+    """
+    Detecta o offset ASCII dos scores (33 = Sanger/Illumina 1.8+/ONT, 64 = Illumina 1.3-1.7)
+    olhando as linhas de qualidade das primeiras leituras. Na dúvida, retorna 33.
+    """
+    lowest = None
+    with smart_open(fastq_file_path) as f:
+        for _ in range(max_reads):
+            id_line = f.readline()
+            if not id_line:
+                break
+            f.readline()
+            f.readline()
+            qual_line = f.readline().strip()
+            if qual_line:
+                low = min(qual_line)
+                lowest = low if lowest is None else min(lowest, low)
+            if lowest is not None and ord(lowest) < 59:
+                return 33
+    if lowest is not None and ord(lowest) >= 64:
+        return 64
+    return 33
+
+def _phred_table(offset):
+    # Tabela para bytes.translate: caractere ASCII -> score Phred (limitado a >= 0).
+    return bytes(max(c - offset, 0) for c in range(256))
+
+def iter_fastq_records(fastq_file_path, phred_offset=None):
+    """
+    Gera (id, sequência, scores Phred em bytes uint8) de cada leitura do arquivo FASTQ
+    (plano ou gz), sem manter o arquivo em memória. phred_offset=None detecta o offset.
+    """
+    if phred_offset is None:
+        phred_offset = detect_phred_offset(fastq_file_path)
+    table = _phred_table(phred_offset)
+    with smart_open(fastq_file_path) as f:
+        while True:
+            id_line = f.readline()
+            if not id_line:
+                break
+            seq_line = f.readline()
+            plus_line = f.readline()
+            qual_line = f.readline()
+            if not qual_line:
+                break
+            scores = qual_line.strip().encode("ascii", "replace").translate(table)
+            yield id_line.strip().lstrip('@').split()[0], seq_line.strip(), scores
+
 def extract_fastq_sequences_and_qualities_with_ids(fastq_file_path):
     """
     Extrai IDs, sequências e scores de qualidade de cada leitura do arquivo FASTQ (plano ou gz).
-    Retorna: ids, sequences, quality_scores
+    Retorna: ids, sequences, quality_scores (Phred em bytes uint8, offset detectado)
     """
     ids = []
     sequences = []
     quality_scores = []
     try:
-        with smart_open(fastq_file_path) as f:
-            while True:
-                id_line = f.readline()
-                if not id_line:
-                    break
-                seq_line = f.readline()
-                plus_line = f.readline()
-                qual_line = f.readline()
-                if not qual_line:
-                    break
-                ids.append(id_line.strip().lstrip('@').split()[0])
-                sequences.append(seq_line.strip())
-                scores = [ord(char) for char in qual_line.strip()]
-                quality_scores.append(scores)
+        for seq_id, seq, scores in iter_fastq_records(fastq_file_path):
+            ids.append(seq_id)
+            sequences.append(seq)
+            quality_scores.append(scores)
         return ids, sequences, quality_scores
     except Exception as e:
         print(f"Erro ao ler arquivo FASTQ: {e}")
@@ -96,42 +143,90 @@ def export_cut_sequences_to_json(ids, seqs, quality_scores, origem_fastq, output
     Exporta cada sequência filtrada de FASTQ para um arquivo JSON individual na pasta assets/Collections/Sequences_cleaned/{amostra},
     incluindo sample_name e nome claro do arquivo final.
     """
+    return export_cut_records_to_json(zip(ids, seqs, quality_scores), origem_fastq, sample_name=sample_name)
+
+def export_cut_records_to_json(records, origem_fastq, sample_name=None):
+    """
+    Igual a export_cut_sequences_to_json, mas consome um iterável de (id, sequência, scores)
+    — por exemplo QualityCutter.iter_cut_records — sem exigir listas em memória.
+    Os scores (Phred uint8) vão em bytes crus para {amostra}_{origem}.qual, e o JSON de cada
+    leitura guarda só a referência (ver load_quality).
+    Retorna o número de JSONs escritos.
+    """
     assets_dir = os.path.join("assets", "Collections", "Sequences_cleaned")
-    if not os.path.exists(assets_dir):
-        os.makedirs(assets_dir)
+    os.makedirs(assets_dir, exist_ok=True)
     amostra_dir = os.path.join(assets_dir, sample_name if sample_name else "undefined_sample")
-    if not os.path.exists(amostra_dir):
-        os.makedirs(amostra_dir)
-    for idx, (seq_id, seq, qs) in enumerate(zip(ids, seqs, quality_scores)):
-        dados = {
-            "ID": seq_id,
-            "sample_name": sample_name,
-            "sequence": seq,
-            "quality": qs,
-            "source_fastq": os.path.basename(origem_fastq),
-            "size": len(seq)
-        }
-        safe_id = "".join([c if c.isalnum() else "_" for c in seq_id])
-        json_file = os.path.join(
-            amostra_dir,
-            f"{sample_name}_{safe_id}_{idx}.json"
-        )
-        try:
-            with open(json_file, "w") as jf:
-                json.dump(dados, jf, indent=4)
-        except Exception as e:
-            print(f"Erro ao salvar JSON de {seq_id}: {e}")
+    os.makedirs(amostra_dir, exist_ok=True)
+    source_name = os.path.basename(origem_fastq)
+    safe_source = "".join([c if c.isalnum() else "_" for c in source_name])
+    qual_name = f"{sample_name}_{safe_source}.qual"
+    written = 0
+    with open(os.path.join(amostra_dir, qual_name), "wb") as qual_file:
+        for idx, (seq_id, seq, qs) in enumerate(records):
+            qs = _as_phred_bytes(qs)
+            qual_offset = qual_file.tell()
+            qual_file.write(qs)
+            dados = {
+                "ID": seq_id,
+                "sample_name": sample_name,
+                "sequence": seq,
+                "quality": {
+                    "file": qual_name,
+                    "offset": qual_offset,
+                    "length": len(qs),
+                    "encoding": QUALITY_ENCODING
+                },
+                "source_fastq": source_name,
+                "size": len(seq)
+            }
+            safe_id = "".join([c if c.isalnum() else "_" for c in seq_id])
+            json_file = os.path.join(
+                amostra_dir,
+                f"{sample_name}_{safe_id}_{idx}.json"
+            )
+            try:
+                with open(json_file, "w") as jf:
+                    json.dump(dados, jf, indent=4)
+                written += 1
+            except Exception as e:
+                print(f"Erro ao salvar JSON de {seq_id}: {e}")
+    return written
+
+def _as_phred_bytes(quality):
+    if isinstance(quality, bytes):
+        return quality
+    return bytes(quality)
+
+def load_quality(record, json_dir):
+    """
+    Lê os scores Phred (bytes uint8) de um JSON de sequência limpa, sem parsing de texto.
+    Para um array numpy: np.frombuffer(load_quality(...), dtype=np.uint8).
+
+    Args:
+        record (dict): Conteúdo do JSON da leitura.
+        json_dir (str): Diretório do JSON (onde está o arquivo .qual).
+
+    Returns:
+        bytes or None: Scores Phred, ou None se a leitura não tiver qualidade (FASTA).
+    """
+    quality = record.get("quality")
+    if quality is None:
+        return None
+    if isinstance(quality, list):
+        # Formato antigo: valores ord() (Phred+33) direto no JSON.
+        return bytes(max(v - 33, 0) for v in quality)
+    with open(os.path.join(json_dir, quality["file"]), "rb") as f:
+        f.seek(quality["offset"])
+        return f.read(quality["length"])
 
 def export_fasta_sequences_to_json(ids, seqs, origem_fasta, sample_name=None):
     """
     Exporta cada sequência FASTA para JSON individual em assets/Collections/Sequences_cleaned/{amostra}, sem scores de qualidade.
     """
     assets_dir = os.path.join("assets", "Collections", "Sequences_cleaned")
-    if not os.path.exists(assets_dir):
-        os.makedirs(assets_dir)
+    os.makedirs(assets_dir, exist_ok=True)
     amostra_dir = os.path.join(assets_dir, sample_name if sample_name else "undefined_sample")
-    if not os.path.exists(amostra_dir):
-        os.makedirs(amostra_dir)
+    os.makedirs(amostra_dir, exist_ok=True)
     for idx, (seq_id, seq) in enumerate(zip(ids, seqs)):
         dados = {
             "ID": seq_id,
@@ -152,11 +247,28 @@ def export_fasta_sequences_to_json(ids, seqs, origem_fasta, sample_name=None):
         except Exception as e:
             print(f"Erro ao salvar JSON de {seq_id}: {e}")
 
-def plot_per_base_quality(quality_scores):
+def _show_or_save(plt, output_path):
+    """Mostra a figura (uso interativo) ou salva em output_path e fecha (uso headless)."""
+    if output_path:
+        plt.savefig(output_path)
+        plt.close()
+    else:
+        plt.show()
+
+def _quality_array(q):
+    """Converte scores (bytes uint8 ou lista) em array numpy sem copiar quando possível."""
+    import numpy as np
+    if isinstance(q, (bytes, bytearray, memoryview)):
+        return np.frombuffer(q, dtype=np.uint8)
+    return np.asarray(q)
+
+def plot_per_base_quality(quality_scores, output_path=None):
+    import numpy as np
+    import matplotlib.pyplot as plt
     m = max(len(q) for q in quality_scores)
     arr = np.full((len(quality_scores), m), np.nan)
     for i, q in enumerate(quality_scores):
-        arr[i, :len(q)] = q
+        arr[i, :len(q)] = _quality_array(q)
     medias = np.nanmean(arr, axis=0)
     medianas = np.nanmedian(arr, axis=0)
     plt.figure(figsize=(12,6))
@@ -164,22 +276,25 @@ def plot_per_base_quality(quality_scores):
     plt.plot(medianas, label='Mediana')
     plt.title('Média e Mediana dos Scores de Qualidade por Posição')
     plt.xlabel('Posição na leitura')
-    plt.ylabel('Score de Qualidade (ASCII)')
+    plt.ylabel('Score de Qualidade (Phred)')
     plt.legend()
     plt.tight_layout()
-    plt.show()
+    _show_or_save(plt, output_path)
 
-def plot_per_sequence_quality(quality_scores):
-    medias_seq = [np.mean(q) for q in quality_scores if len(q) > 0]
+def plot_per_sequence_quality(quality_scores, output_path=None):
+    import numpy as np
+    import matplotlib.pyplot as plt
+    medias_seq = [np.mean(_quality_array(q)) for q in quality_scores if len(q) > 0]
     plt.figure(figsize=(8,5))
     plt.hist(medias_seq, bins=50, color='skyblue')
     plt.xlabel("Média da Qualidade por Leitura")
     plt.ylabel("Frequência")
     plt.title("Distribuição da Média dos Scores de Qualidade por Leitura")
     plt.tight_layout()
-    plt.show()
+    _show_or_save(plt, output_path)
 
-def plot_read_length_distribution(quality_scores):
+def plot_read_length_distribution(quality_scores, output_path=None):
+    import matplotlib.pyplot as plt
     tam = [len(q) for q in quality_scores]
     plt.figure(figsize=(8,5))
     plt.hist(tam, bins=50, color='orange')
@@ -187,22 +302,25 @@ def plot_read_length_distribution(quality_scores):
     plt.ylabel("Frequência")
     plt.title("Distribuição do Tamanho das Leituras")
     plt.tight_layout()
-    plt.show()
+    _show_or_save(plt, output_path)
 
 def calc_gc_content(sequences):
     gc_percent = [100 * (s.upper().count('G') + s.upper().count('C')) / len(s) if len(s) > 0 else 0 for s in sequences]
     return gc_percent
 
-def plot_gc_content(gc_percent):
+def plot_gc_content(gc_percent, output_path=None):
+    import matplotlib.pyplot as plt
     plt.figure(figsize=(8,5))
     plt.hist(gc_percent, bins=50, color='green')
     plt.xlabel("GC Content (%)")
     plt.ylabel("Frequência")
     plt.title("Distribuição de GC Content nas Leituras")
     plt.tight_layout()
-    plt.show()
+    _show_or_save(plt, output_path)
 
-def plot_base_content_by_position(sequences):
+def plot_base_content_by_position(sequences, output_path=None):
+    import numpy as np
+    import matplotlib.pyplot as plt
     m = max(len(s) for s in sequences)
     contagens = {base: np.zeros(m) for base in 'ATCGN'}
     total_pos = np.zeros(m)
@@ -220,7 +338,88 @@ def plot_base_content_by_position(sequences):
     plt.ylabel('Porcentagem [%]')
     plt.legend()
     plt.tight_layout()
-    plt.show()
+    _show_or_save(plt, output_path)
+
+class QualityHistogram:
+    """
+    Resumo de qualidade em uma passada, com memória fixa (independente do nº de leituras):
+    histograma de todos os scores e histograma do menor score de cada leitura.
+    Uma leitura passa no limiar t exatamente quando seu menor score é >= t, então as taxas
+    de aprovação por limiar e a média dos scores saem exatas do histograma.
+    """
+    SIZE = 256
+
+    def __init__(self):
+        self.score_counts = [0] * self.SIZE
+        self.min_counts = [0] * self.SIZE
+        self.reads = 0
+        self.bases = 0
+
+    def add(self, quality):
+        if len(quality) == 0:
+            return
+        for score, n in Counter(quality).items():
+            self.score_counts[min(max(score, 0), self.SIZE - 1)] += n
+        self.min_counts[min(max(min(quality), 0), self.SIZE - 1)] += 1
+        self.reads += 1
+        self.bases += len(quality)
+
+    def mean_score(self):
+        if not self.bases:
+            return None
+        return sum(score * n for score, n in enumerate(self.score_counts)) / self.bases
+
+    def pass_fraction(self, threshold):
+        """Fração de leituras com todos os scores >= threshold."""
+        if not self.reads:
+            return 0.0
+        return sum(self.min_counts[max(0, threshold):]) / self.reads
+
+
+
+def _reservoir_sample(items, size, seed=0):
+    """
+    Amostra aleatória uniforme de `size` itens de um iterável de tamanho desconhecido,
+    em uma passada (reservoir sampling, algoritmo R). Retorna (amostra, total de itens).
+    """
+    import random
+    rng = random.Random(seed)
+    sample = []
+    seen = 0
+    for item in items:
+        if seen < size:
+            sample.append(item)
+        else:
+            j = rng.randrange(seen + 1)
+            if j < size:
+                sample[j] = item
+        seen += 1
+    return sample, seen
+
+
+def _mean_score_stderr(reads, mean):
+    """
+    Erro padrão da média dos scores (ponderada por base) com a leitura como unidade de
+    amostragem: estimador de razão sum(scores)/sum(tamanhos) sobre leituras amostradas.
+    As bases de uma mesma leitura são correlacionadas, então não entram como independentes.
+    """
+    n = len(reads)
+    if n < 2:
+        return None
+    mean_length = sum(len(q) for q in reads) / n
+    residuals = sum((sum(q) - mean * len(q)) ** 2 for q in reads) / (n - 1)
+    return (residuals / n) ** 0.5 / mean_length
+
+
+def _wilson_interval(fraction, n, z=1.96):
+    """Intervalo de confiança de Wilson (95% por padrão) para uma proporção."""
+    if n == 0:
+        return (0.0, 1.0)
+    denom = 1 + z * z / n
+    center = (fraction + z * z / (2 * n)) / denom
+    half = z * ((fraction * (1 - fraction) / n + z * z / (4 * n * n)) ** 0.5) / denom
+    return (max(0.0, center - half), min(1.0, center + half))
+
 
 class QualityCutter:
     """
@@ -231,38 +430,105 @@ class QualityCutter:
         self.cutoff = None
 
     def analyze_and_set_cutoff(self, quality_scores):
+        import numpy as np
         percent_per_cut = {}
-        # Checa se todos os elementos de quality_scores são listas e têm o mesmo comprimento
-        if not quality_scores or not isinstance(quality_scores, list) or not any([isinstance(q, list) and len(q) > 0 for q in quality_scores]):
+        # Checa se quality_scores tem ao menos uma leitura com scores (bytes Phred ou lista)
+        if not quality_scores or not isinstance(quality_scores, list) or not any([isinstance(q, (bytes, bytearray, list)) and len(q) > 0 for q in quality_scores]):
             raise ValueError("quality_scores está vazio ou contém entradas inválidas/FASTAs.")
 
-        comprimentos = set([len(q) for q in quality_scores if len(q) > 0])
-        if len(comprimentos) > 1:
-            # Reads de tamanhos diferentes (normal em FASTQ), montar array tipo "object" ou usar masked array
-            arr = [np.array(q) for q in quality_scores if len(q) > 0]
-        else:
-            arr = np.array([np.array(q) for q in quality_scores if len(q) > 0])
-
-        # O resto do seu código continua igual, só usar 'arr' como lista para média etc.
+        # Reads de tamanhos diferentes (normal em FASTQ): lista de arrays uint8
+        arr = [_quality_array(q) for q in quality_scores if len(q) > 0]
 
         for thresh in self.thresholds:
             passes = [np.all(q >= thresh) for q in arr]
             percent = 100 * np.sum(passes) / len(passes) if len(passes) > 0 else 0
             percent_per_cut[thresh] = percent
-        all_scores = np.concatenate([q for q in quality_scores if len(q) > 0])
+        all_scores = np.concatenate(arr)
         mean_score = np.mean(all_scores)
         best_cut = self.thresholds[np.argmin([abs(mean_score - t) for t in self.thresholds])]
         self.cutoff = best_cut
         return {'percent_per_cut': percent_per_cut, 'suggested_cut': best_cut}
 
+    def estimate_cutoff(self, quality_iter, max_reads=None, seed=0):
+        """
+        Escolhe o cutoff em modo streaming, com memória fixa (QualityHistogram), sem
+        guardar os scores do arquivo. Aceita qualquer iterável de listas de scores, por
+        exemplo `(q for _, _, q in iter_fastq_records(path))`.
+
+        Com max_reads=None o resultado é exato (igual ao de analyze_and_set_cutoff).
+        Com max_reads=N, uma amostra aleatória uniforme de N leituras (reservoir sampling,
+        reprodutível por `seed`) é mantida em memória e o retorno traz intervalos de
+        confiança de 95% com a leitura como unidade amostral: Wilson para as taxas de
+        aprovação e estimador de razão para a média. O arquivo ainda é percorrido
+        inteiro, mas só as leituras amostradas são analisadas; se houver até N leituras,
+        o resultado é exato.
+
+        Returns:
+            dict: percent_per_cut, suggested_cut, mean_score, reads (analisadas),
+                  total_reads, exact, percent_per_cut_ci95 e mean_score_ci95.
+        """
+        hist = QualityHistogram()
+        sample = None
+        if max_reads is None:
+            for q in quality_iter:
+                hist.add(q)
+            total_reads = hist.reads
+        else:
+            sample, total_reads = _reservoir_sample((q for q in quality_iter if len(q) > 0), max_reads, seed)
+            for q in sample:
+                hist.add(q)
+        if not hist.reads:
+            raise ValueError("Nenhum score de qualidade válido para estimar o cutoff.")
+
+        exact = hist.reads == total_reads
+        mean_score = hist.mean_score()
+        percent_per_cut = {}
+        percent_ci = {}
+        for thresh in self.thresholds:
+            frac = hist.pass_fraction(thresh)
+            percent_per_cut[thresh] = 100 * frac
+            low, high = (frac, frac) if exact else _wilson_interval(frac, hist.reads)
+            percent_ci[thresh] = (100 * low, 100 * high)
+        stderr = 0.0 if exact else (_mean_score_stderr(sample, mean_score) or 0.0)
+        best_cut = min(self.thresholds, key=lambda t: abs(mean_score - t))
+        self.cutoff = best_cut
+        return {
+            'percent_per_cut': percent_per_cut,
+            'suggested_cut': best_cut,
+            'mean_score': mean_score,
+            'reads': hist.reads,
+            'total_reads': total_reads,
+            'exact': exact,
+            'percent_per_cut_ci95': percent_ci,
+            'mean_score_ci95': (mean_score - 1.96 * stderr, mean_score + 1.96 * stderr),
+        }
+
+    def cut_read(self, seq, quality):
+        """Remove as bases abaixo do cutoff de uma leitura; retorna (seq, scores) ou None se nada restar."""
+        if self.cutoff is None:
+            raise ValueError("Cutoff não definido! Use analyze_and_set_cutoff primeiro.")
+        s_new = ''.join([base for base, score in zip(seq, quality) if score >= self.cutoff])
+        if not s_new:
+            return None
+        q_new = [score for score in quality if score >= self.cutoff]
+        if isinstance(quality, (bytes, bytearray)):
+            q_new = bytes(q_new)
+        return s_new, q_new
+
+    def iter_cut_records(self, records):
+        """Aplica cut_read a um iterável de (id, seq, scores), descartando leituras vazias."""
+        for seq_id, seq, quality in records:
+            cut = self.cut_read(seq, quality)
+            if cut is not None:
+                yield seq_id, cut[0], cut[1]
+
     def cut_low_quality_bases(self, seqs, quality_scores):
         if self.cutoff is None:
             raise ValueError("Cutoff não definido! Use analyze_and_set_cutoff primeiro.")
         seqs_filt, qs_filt = [], []
         for s, q in zip(seqs, quality_scores):
-            s_new = ''.join([base for base, score in zip(s, q) if score >= self.cutoff])
-            q_new = [score for score in q if score >= self.cutoff]
-            if len(s_new) > 0:
-                seqs_filt.append(s_new)
-                qs_filt.append(q_new)
+            cut = self.cut_read(s, q)
+            if cut is not None:
+                seqs_filt.append(cut[0])
+                qs_filt.append(cut[1])
         return seqs_filt, qs_filt
@@ -0,0 +1,356 @@
+# Modules/report.py
+
+"""
+report.py
+Relatório de QC em lote, sem interface gráfica (backend Agg).
+Inclui:
+ - QCAccumulator: agregados de QC calculados em uma passada (por leitura), serializáveis em JSON
+ - Renderização por amostra em PNG/SVG a partir dos agregados (sem reler as leituras)
+ - Renderização paralela de várias amostras (ProcessPoolExecutor) e resumo HTML (index.html)
+
+Uso a partir de agregados já salvos:
+    python -m Modules.report assets/Collections/QC assets/Collections/QC/report --workers 8
+"""
+
+from Install.Libs.LIB import MODULES
+os = MODULES["os"]
+json = MODULES["json"]
+
+import html
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+AGGREGATES_FILENAME = "qc_aggregates.json"
+# Scores Phred 0..93 (faixa imprimível do Phred+33); valores acima são truncados.
+_MAX_SCORE = 94
+# Máximo de posições (linhas do histograma) por amostra. Leituras mais longas que isso
+# são agrupadas em faixas de posições de largura 2^k, como no FastQC, para que a memória
+# não cresça com o tamanho da maior leitura (ex.: leituras longas de nanopore).
+_MAX_POSITION_BINS = 1024
+_BASES = "ATCGN"
+
+
+class QCAccumulator:
+    """
+    Acumula os agregados usados pelos gráficos de QC de uma amostra:
+    histograma de qualidade por posição (média/mediana), média por leitura, tamanho,
+    GC e conteúdo de bases por posição. Memória limitada a _MAX_POSITION_BINS faixas de
+    posição, independente do número e do tamanho das leituras.
+    """
+    def __init__(self):
+        import numpy as np
+        self._np = np
+        self.reads = 0
+        self.max_length = 0
+        self.bin_width = 1
+        self.position_hist = np.zeros((0, _MAX_SCORE), dtype=np.uint32)
+        self.base_counts = {base: np.zeros(0, dtype=np.uint64) for base in _BASES}
+        self.total_per_position = np.zeros(0, dtype=np.uint64)
+        self.read_mean_quality = Counter()
+        self.read_length = Counter()
+        self.gc_percent = Counter()
+
+    def _merge_bins(self, array):
+        """Soma pares de faixas vizinhas (dobra a largura da faixa)."""
+        np = self._np
+        if array.shape[0] % 2:
+            pad = np.zeros((1,) + array.shape[1:], dtype=array.dtype)
+            array = np.concatenate([array, pad])
+        return array[0::2] + array[1::2]
+
+    def _grow(self, length):
+        np = self._np
+        self.max_length = max(self.max_length, length)
+        while -(-length // self.bin_width) > _MAX_POSITION_BINS:
+            self.position_hist = self._merge_bins(self.position_hist)
+            for base in _BASES:
+                self.base_counts[base] = self._merge_bins(self.base_counts[base])
+            self.total_per_position = self._merge_bins(self.total_per_position)
+            self.bin_width *= 2
+        needed = -(-length // self.bin_width)
+        current = self.total_per_position.shape[0]
+        if needed <= current:
+            return
+        # Cresce em blocos (ao menos dobrando, até o limite) para não realocar a cada leitura maior.
+        extra = min(max(needed, 2 * current), _MAX_POSITION_BINS) - current
+        self.position_hist = np.vstack([self.position_hist, np.zeros((extra, _MAX_SCORE), dtype=np.uint32)])
+        for base in _BASES:
+            self.base_counts[base] = np.concatenate([self.base_counts[base], np.zeros(extra, dtype=np.uint64)])
+        self.total_per_position = np.concatenate([self.total_per_position, np.zeros(extra, dtype=np.uint64)])
+
+    def _per_bin(self, length):
+        """Número de bases da leitura em cada faixa de posição (para bin_width > 1)."""
+        np = self._np
+        counts = np.full(-(-length // self.bin_width), self.bin_width, dtype=np.uint64)
+        counts[-1] = length - self.bin_width * (len(counts) - 1)
+        return counts
+
+    def add(self, sequence, quality=None):
+        """Adiciona uma leitura (sequência e, para FASTQ, os scores de qualidade)."""
+        np = self._np
+        length = len(sequence)
+        self.reads += 1
+        self.read_length[length] += 1
+        if length == 0:
+            return
+        if quality is not None and len(quality) > 0:
+            self._grow(max(length, len(quality)))
+        else:
+            self._grow(length)
+        width = self.bin_width
+        seq = sequence.upper()
+        gc = seq.count("G") + seq.count("C")
+        self.gc_percent[int(round(100 * gc / length))] += 1
+        codes = np.frombuffer(seq.encode("ascii", "replace"), dtype=np.uint8)
+        n_bins = -(-length // width)
+        if width == 1:
+            for base in _BASES:
+                self.base_counts[base][:length] += codes == ord(base)
+            self.total_per_position[:length] += 1
+        else:
+            bins = np.arange(length) // width
+            for base in _BASES:
+                self.base_counts[base][:n_bins] += np.bincount(
+                    bins[codes == ord(base)], minlength=n_bins).astype(np.uint64)
+            self.total_per_position[:n_bins] += self._per_bin(length)
+        if quality is not None and len(quality) > 0:
+            q = np.clip(np.asarray(bytearray(quality) if isinstance(quality, (bytes, bytearray)) else quality,
+                                   dtype=np.int64), 0, _MAX_SCORE - 1)
+            if width == 1:
+                self.position_hist[np.arange(len(q)), q] += 1
+            else:
+                np.add.at(self.position_hist, (np.arange(len(q)) // width, q), 1)
+            self.read_mean_quality[int(round(float(q.mean())))] += 1
+
+    def to_dict(self):
+        """Agregados prontos para JSON (e para render_sample_report)."""
+        np = self._np
+        n = -(-self.max_length // self.bin_width)
+        hist = self.position_hist[:n].astype(np.float64)
+        counts = hist.sum(axis=1)
+        scores = np.arange(_MAX_SCORE)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = (hist * scores).sum(axis=1) / counts
+        cumulative = np.cumsum(hist, axis=1)
+        median = [int(np.searchsorted(cumulative[i], counts[i] / 2.0)) if counts[i] else None
+                  for i in range(hist.shape[0])]
+        return {
+            "reads": self.reads,
+            "position_bin_width": self.bin_width,
+            "per_position_quality": {
+                "mean": [None if np.isnan(v) else float(v) for v in mean],
+                "median": median,
+            },
+            "read_mean_quality": _counter_to_json(self.read_mean_quality),
+            "read_length": _counter_to_json(self.read_length),
+            "gc_percent": _counter_to_json(self.gc_percent),
+            "base_content": {base: self.base_counts[base][:n].tolist() for base in _BASES},
+            "total_per_position": self.total_per_position[:n].tolist(),
+        }
+
+
+def _counter_to_json(counter):
+    return {str(k): v for k, v in sorted(counter.items())}
+
+
+def _json_to_hist(data):
+    items = sorted((float(k), v) for k, v in data.items())
+    return [k for k, _ in items], [v for _, v in items]
+
+
+def save_aggregates(aggregates, sample_dir):
+    """Salva os agregados em sample_dir/qc_aggregates.json e retorna o caminho."""
+    os.makedirs(sample_dir, exist_ok=True)
+    path = os.path.join(sample_dir, AGGREGATES_FILENAME)
+    with open(path, "w") as f:
+        json.dump(aggregates, f)
+    return path
+
+
+def load_aggregates(qc_root):
+    """Lê {amostra: agregados} de qc_root/{amostra}/qc_aggregates.json."""
+    result = {}
+    for sample in sorted(os.listdir(qc_root)):
+        path = os.path.join(qc_root, sample, AGGREGATES_FILENAME)
+        if os.path.isfile(path):
+            with open(path) as f:
+                result[sample] = json.load(f)
+    return result
+
+
+def _pyplot():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def render_sample_report(sample, aggregates, output_dir, formats=("png", "svg")):
+    """
+    Renderiza todos os gráficos de QC de uma amostra a partir dos agregados.
+    Retorna {nome_do_grafico: [arquivos]}.
+    """
+    plt = _pyplot()
+    sample_dir = os.path.join(output_dir, sample)
+    os.makedirs(sample_dir, exist_ok=True)
+    outputs = {}
+
+    def save(fig, name):
+        fig.tight_layout()
+        paths = []
+        for fmt in formats:
+            path = os.path.join(sample_dir, f"{name}.{fmt}")
+            fig.savefig(path)
+            paths.append(path)
+        plt.close(fig)
+        outputs[name] = paths
+
+    # Faixas de posição (largura > 1 quando há leituras mais longas que _MAX_POSITION_BINS)
+    width = aggregates.get("position_bin_width", 1)
+    per_pos = aggregates["per_position_quality"]
+    if any(v is not None for v in per_pos["mean"]):
+        fig, ax = plt.subplots(figsize=(12, 6))
+        positions = [i * width for i in range(len(per_pos["mean"]))]
+        ax.plot(positions, [float("nan") if v is None else v for v in per_pos["mean"]], label="Média")
+        ax.plot(positions, [float("nan") if v is None else v for v in per_pos["median"]], label="Mediana")
+        ax.set_title(f"{sample}: Média e Mediana dos Scores de Qualidade por Posição")
+        ax.set_xlabel("Posição na leitura")
+        ax.set_ylabel("Score de Qualidade")
+        ax.legend()
+        save(fig, "per_base_quality")
+
+    if aggregates["read_mean_quality"]:
+        x, y = _json_to_hist(aggregates["read_mean_quality"])
+        fig, ax = plt.subplots(figsize=(8, 5))
+        ax.bar(x, y, width=1.0, color="skyblue")
+        ax.set_xlabel("Média da Qualidade por Leitura")
+        ax.set_ylabel("Frequência")
+        ax.set_title(f"{sample}: Distribuição da Média dos Scores de Qualidade por Leitura")
+        save(fig, "per_sequence_quality")
+
+    x, y = _json_to_hist(aggregates["read_length"])
+    fig, ax = plt.subplots(figsize=(8, 5))
+    ax.hist(x, bins=50, weights=y, color="orange")
+    ax.set_xlabel("Tamanho da Leitura (bases)")
+    ax.set_ylabel("Frequência")
+    ax.set_title(f"{sample}: Distribuição do Tamanho das Leituras")
+    save(fig, "read_length_distribution")
+
+    x, y = _json_to_hist(aggregates["gc_percent"])
+    fig, ax = plt.subplots(figsize=(8, 5))
+    ax.bar(x, y, width=1.0, color="green")
+    ax.set_xlabel("GC Content (%)")
+    ax.set_ylabel("Frequência")
+    ax.set_title(f"{sample}: Distribuição de GC Content nas Leituras")
+    save(fig, "gc_content")
+
+    total = aggregates["total_per_position"]
+    if total:
+        fig, ax = plt.subplots(figsize=(14, 7))
+        for base in _BASES:
+            counts = aggregates["base_content"][base]
+            ax.plot([i * width for i in range(len(total))],
+                    [100.0 * c / t if t else float("nan") for c, t in zip(counts, total)], label=f"%{base}")
+        ax.set_title(f"{sample}: Conteúdo Percentual de Bases por Posição")
+        ax.set_xlabel("Posição na leitura")
+        ax.set_ylabel("Porcentagem [%]")
+        ax.legend()
+        save(fig, "base_content_by_position")
+
+    return outputs
+
+
+def _render_job(args):
+    sample, aggregates, output_dir, formats = args
+    try:
+        return sample, render_sample_report(sample, aggregates, output_dir, formats), None
+    except Exception as e:
+        return sample, {}, str(e)
+
+
+def _summary_row(aggregates):
+    lengths = aggregates["read_length"]
+    n = sum(lengths.values())
+    mean_len = sum(int(k) * v for k, v in lengths.items()) / n if n else 0
+    gc = aggregates["gc_percent"]
+    n_gc = sum(gc.values())
+    mean_gc = sum(int(k) * v for k, v in gc.items()) / n_gc if n_gc else 0
+    rq = aggregates["read_mean_quality"]
+    n_q = sum(rq.values())
+    mean_q = sum(int(k) * v for k, v in rq.items()) / n_q if n_q else None
+    return aggregates["reads"], mean_len, mean_q, mean_gc
+
+
+def write_html_summary(results, aggregates_by_sample, output_dir, formats=("png", "svg")):
+    """Escreve output_dir/index.html com uma linha por amostra e os gráficos gerados."""
+    image_fmt = "png" if "png" in formats else formats[0]
+    rows = []
+    sections = []
+    for sample in sorted(results):
+        outputs, error = results[sample]
+        reads, mean_len, mean_q, mean_gc = _summary_row(aggregates_by_sample[sample])
+        q_text = f"{mean_q:.1f}" if mean_q is not None else "-"
+        status = "OK" if error is None else f"Erro: {html.escape(error)}"
+        name = html.escape(sample)
+        rows.append(f"<tr><td><a href='#{name}'>{name}</a></td><td>{reads}</td><td>{mean_len:.0f}</td>"
+                    f"<td>{q_text}</td><td>{mean_gc:.1f}</td><td>{status}</td></tr>")
+        images = []
+        for plot_name, paths in outputs.items():
+            chosen = next((p for p in paths if p.endswith("." + image_fmt)), paths[0])
+            rel = html.escape(os.path.relpath(chosen, output_dir))
+            images.append(f"<figure><img src='{rel}' width='600'><figcaption>{plot_name}</figcaption></figure>")
+        sections.append(f"<h2 id='{name}'>{name}</h2>\n" + "\n".join(images))
+    page = (
+        "<!DOCTYPE html>\n<html><head><meta charset='utf-8'><title>Relatório de QC</title></head><body>\n"
+        "<h1>Relatório de QC</h1>\n<table border='1'>\n"
+        "<tr><th>Amostra</th><th>Leituras</th><th>Tamanho médio</th><th>Qualidade média</th>"
+        "<th>GC médio (%)</th><th>Status</th></tr>\n" + "\n".join(rows) + "\n</table>\n"
+        + "\n".join(sections) + "\n</body></html>\n"
+    )
+    path = os.path.join(output_dir, "index.html")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(page)
+    return path
+
+
+def render_qc_report(aggregates_by_sample, output_dir, formats=("png", "svg"), workers=None, mp_context=None):
+    """
+    Renderiza o relatório de QC de todas as amostras em paralelo e escreve o index.html.
+
+    Args:
+        aggregates_by_sample (dict): {amostra: agregados} (ver QCAccumulator.to_dict / load_aggregates).
+        output_dir (str): Diretório de saída do relatório.
+        formats (tuple): Formatos de imagem ('png', 'svg').
+        workers (int): Nº de processos (None = nº de CPUs; 1 = sem paralelismo).
+        mp_context: Contexto de multiprocessing dos processos (ex.: "spawn" em processos com threads).
+
+    Returns:
+        str: Caminho do index.html.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = [(sample, agg, output_dir, tuple(formats)) for sample, agg in aggregates_by_sample.items()]
+    if workers != 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as executor:
+            done = list(executor.map(_render_job, jobs))
+    else:
+        done = [_render_job(job) for job in jobs]
+    results = {}
+    for sample, outputs, error in done:
+        if error:
+            print(f"[ERRO] Relatório de QC falhou para {sample}: {error}")
+        results[sample] = (outputs, error)
+    index_path = write_html_summary(results, aggregates_by_sample, output_dir, formats)
+    print(f"[INFO] Relatório de QC ({len(results)} amostras) salvo em: {index_path}")
+    return index_path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Renderiza o relatório de QC a partir de agregados salvos.")
+    parser.add_argument("qc_root", help="Diretório com {amostra}/qc_aggregates.json")
+    parser.add_argument("output_dir")
+    parser.add_argument("--formats", nargs="+", default=["png", "svg"])
+    parser.add_argument("--workers", type=int, default=None)
+    a = parser.parse_args()
+    render_qc_report(load_aggregates(a.qc_root), a.output_dir, a.formats, a.workers)
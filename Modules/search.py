@@ -4,11 +4,13 @@ from Install.Libs.LIB import MODULES
 os = MODULES["os"]
 json = MODULES["json"]
 
-import pandas as pd
 import os
 import json
 import gzip
 from collections import Counter
+from contextlib import nullcontext
+
+from Modules.encoding import encode_sequence
 
 def smart_open(file_path):
     if file_path.lower().endswith('.gz'):
@@ -48,6 +50,31 @@ def yield_sequences_from_file(file_path):
     except Exception:
         pass
 
+def yield_cleaned_sequences_from_file(file_path):
+    """
+    Gera as sequências de um arquivo como elas ficam depois da limpeza (clean_sample): FASTQ
+    passa pelo mesmo cutoff (estimado sobre o arquivo inteiro, logo idêntico) e pelo mesmo
+    corte de bases; FASTA sai como está. Assim leituras brutas casam com as únicas limpas.
+    """
+    from Modules.quality import QualityCutter, iter_fastq_records
+
+    try:
+        with smart_open(file_path) as f:
+            is_fastq = f.read(1) == '@'
+    except Exception:
+        return
+    if not is_fastq:
+        yield from yield_sequences_from_file(file_path)
+        return
+    cutter = QualityCutter()
+    try:
+        cutter.estimate_cutoff(q for _, _, q in iter_fastq_records(file_path))
+    except Exception:
+        # Sem scores válidos: a limpeza também pula o arquivo
+        return
+    for _, seq, _ in cutter.iter_cut_records(iter_fastq_records(file_path)):
+        yield seq
+
 def blast_taxonomy_search_local(sequence, blast_db_path, max_hits=5, min_identity=80.0, parse_func=None):
     """
     Busca taxonomia via BLAST local para uma sequência; retorna string taxonômica.
@@ -121,34 +148,153 @@ def parse_taxonomy_from_description(description):
         return f"Unknown; {parts[0]} {parts[1]}"
     return "Unknown"
 
-def add_taxonomy_to_unique_jsons(unique_dir="assets/Collections/Unique", taxonomy_func=None):
+TAXONOMY_SIDECAR_PATH = os.path.join("assets", "Collections", "unique_taxonomy.tsv")
+_JSON_WRITE_BATCH = 256
+
+def classify_unique_sequences(unique_dir="assets/Collections/Unique", taxonomy_func=None, workers=1):
     """
-    Atualiza cada JSON de sequência única adicionando informação taxonômica (campo 'taxonomy').
-    taxonomy_func deve ser uma função que recebe a sequência e retorna a string/classificação desejada.
+    Classifica todas as sequências únicas, sem escrever nada.
+    Com workers > 1 as chamadas a taxonomy_func rodam em threads (o BLAST é um subprocesso).
+    Retorna lista de (filename, ID, sequence, taxonomy); o restante de cada JSON não fica
+    em memória (é relido só na hora de gravar, em _rewrite_json_batch).
     """
-    for filename in os.listdir(unique_dir):
+    from concurrent.futures import ThreadPoolExecutor
+
+    entries = []
+    for filename in sorted(os.listdir(unique_dir)):
         if filename.endswith('.json'):
-            path = os.path.join(unique_dir, filename)
-            with open(path) as f:
+            with open(os.path.join(unique_dir, filename)) as f:
                 data = json.load(f)
-            seq = data["sequence"]
-            taxonomy = taxonomy_func(seq) if taxonomy_func else "Unknown_taxonomy"
-            data["taxonomy"] = taxonomy
-            with open(path, 'w') as f:
-                json.dump(data, f, indent=4)
+            entries.append((filename, data.get("ID"), data["sequence"]))
+
+    def classify(seq):
+        return taxonomy_func(seq) if taxonomy_func else "Unknown_taxonomy"
+
+    sequences = [seq for _, _, seq in entries]
+    if workers and workers > 1 and taxonomy_func:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            taxonomies = list(executor.map(classify, sequences))
+    else:
+        taxonomies = [classify(seq) for seq in sequences]
+    return [entry + (taxonomy,) for entry, taxonomy in zip(entries, taxonomies)]
+
+def _replace_atomic(path, write):
+    """
+    Escreve em um temporário no mesmo diretório e troca com os.replace (atômico),
+    mantendo as permissões do arquivo original (ou as da umask, se ele ainda não existe).
+    """
+    import uuid
+    # O temporário é criado com 0666 (a umask se aplica, como em um open() comum); a umask
+    # do processo não é lida nem alterada, pois é compartilhada com as outras threads.
+    tmp_path = os.path.join(os.path.dirname(path) or ".", f".{os.path.basename(path)}.{uuid.uuid4().hex[:12]}.tmp")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        try:
+            os.fchmod(fd, os.stat(path).st_mode & 0o7777)
+        except FileNotFoundError:
+            pass
+        with os.fdopen(fd, 'w', newline='') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def write_taxonomy_sidecar(results, sidecar_path=TAXONOMY_SIDECAR_PATH):
+    """Grava a tabela ID / digest / taxonomia (TSV) de uma vez, atomicamente."""
+    import csv
+    from Modules.encoding import sequence_digest
+
+    sidecar_dir = os.path.dirname(sidecar_path)
+    if sidecar_dir and not os.path.exists(sidecar_dir):
+        os.makedirs(sidecar_dir)
+
+    def write(f):
+        writer = csv.writer(f, delimiter='\t')
+        writer.writerow(["ID", "digest", "taxonomy"])
+        for _, seq_id, sequence, taxonomy in results:
+            writer.writerow([str(seq_id), sequence_digest(sequence), taxonomy])
+    _replace_atomic(sidecar_path, write)
+
+def read_taxonomy_sidecar(sidecar_path=TAXONOMY_SIDECAR_PATH):
+    """Retorna {ID: taxonomia} da tabela lateral (vazio se não existir)."""
+    import csv
+    if not os.path.exists(sidecar_path):
+        return {}
+    with open(sidecar_path, newline='') as f:
+        return {row["ID"]: row["taxonomy"] for row in csv.DictReader(f, delimiter='\t')}
+
+def _rewrite_json_batch(unique_dir, batch):
+    """Relê cada JSON do lote, acrescenta 'taxonomy' e o troca atomicamente."""
+    for filename, _, _, taxonomy in batch:
+        path = os.path.join(unique_dir, filename)
+        with open(path) as f:
+            data = json.load(f)
+        data["taxonomy"] = taxonomy
+        _replace_atomic(path, lambda f: json.dump(data, f, indent=4))
+    return len(batch)
+
+def add_taxonomy_to_unique_jsons(unique_dir="assets/Collections/Unique", taxonomy_func=None, db_path=None,
+                                 sidecar_path=None, workers=1):
+    """
+    Adiciona informação taxonômica (campo 'taxonomy') às sequências únicas.
+    taxonomy_func deve ser uma função que recebe a sequência e retorna a string/classificação desejada.
+
+    Primeiro classifica todas as sequências (em paralelo com workers > 1) e só então grava,
+    em lote, em um destes destinos:
+     - db_path: tabela 'taxonomy' do índice SQLite (Modules/database.py), em uma transação;
+     - sidecar_path: tabela lateral TSV (ID, digest, taxonomia), trocada atomicamente;
+     - nenhum dos dois: reescreve os JSONs em lotes paralelos, cada arquivo de forma atômica.
+    Retorna o número de sequências classificadas.
+    """
+    results = classify_unique_sequences(unique_dir, taxonomy_func, workers)
+
+    if db_path:
+        from Modules.database import connect, update_taxonomy
+        from Modules.encoding import sequence_digest
+
+        conn = connect(db_path)
+        try:
+            n = update_taxonomy(conn, ((sequence_digest(sequence), taxonomy)
+                                       for _, _, sequence, taxonomy in results))
+        finally:
+            conn.close()
+        print(f"[INFO] Taxonomia de {n} sequências únicas gravada em: {db_path}")
+    if sidecar_path:
+        write_taxonomy_sidecar(results, sidecar_path)
+        print(f"[INFO] Tabela de taxonomia ({len(results)} sequências) salva em: {sidecar_path}")
+    if db_path or sidecar_path:
+        return len(results)
+
+    from concurrent.futures import ThreadPoolExecutor
+    batches = [results[i:i + _JSON_WRITE_BATCH] for i in range(0, len(results), _JSON_WRITE_BATCH)]
+    with ThreadPoolExecutor(max_workers=max(1, workers or 1)) as executor:
+        list(executor.map(lambda batch: _rewrite_json_batch(unique_dir, batch), batches))
     print(f"[INFO] Taxonomia adicionada a todos os arquivos JSON únicos.")
+    return len(results)
 
 def index_raw_sequences(amostra_dir):
-    seqs = []
+    """
+    Conta as leituras de uma amostra, já cortadas como na limpeza (ver
+    yield_cleaned_sequences_from_file). As chaves do Counter são blobs 2-bit
+    (ver Modules/encoding.py); consulte com encode_sequence(seq).
+    """
+    counts = Counter()
     for arquivo in os.listdir(amostra_dir):
         path = os.path.join(amostra_dir, arquivo)
-        seqs.extend(list(yield_sequences_from_file(path)))
-    return Counter(seqs)
+        counts.update(encode_sequence(seq) for seq in yield_cleaned_sequences_from_file(path))
+    return counts
 
-def count_unique_sequences_in_raw_fast(unique_dir="assets/Collections/Unique", raw_dir="assets/Collections/Raw_sequences"):
+def count_unique_sequences_in_raw_fast(unique_dir="assets/Collections/Unique", raw_dir="assets/Collections/Raw_sequences",
+                                       db_path=None, sidecar_path=None):
     """
     Gera matriz abundância: sequências únicas x amostra; exporta para CSV e retorna DataFrame.
+
+    Com db_path, a taxonomia vem do índice SQLite (tabela 'taxonomy') e as contagens
+    brutas são gravadas na tabela 'sample_counts' (source='raw'). Com sidecar_path, a
+    taxonomia vem da tabela lateral gravada por add_taxonomy_to_unique_jsons (junção por ID).
     """
+    import pandas as pd  # importado sob demanda: só a exportação da matriz precisa do pandas
     unique_files = [os.path.join(unique_dir, f) for f in os.listdir(unique_dir) if f.endswith('.json')]
     uniques = []
     for f in unique_files:
@@ -157,17 +303,37 @@ def count_unique_sequences_in_raw_fast(unique_dir="assets/Collections/Unique", r
             uniques.append(data)
     amostras = sorted([d for d in os.listdir(raw_dir) if os.path.isdir(os.path.join(raw_dir, d))])
     amostra_counts = {amostra: index_raw_sequences(os.path.join(raw_dir, amostra)) for amostra in amostras}
-    data_matrix = []
-    for uq in uniques:
-        row = {
-            "taxonomy": uq.get("taxonomy"),
-            "ID": uq.get("ID"),
-            "sequence": uq.get("sequence")
-        }
-        seq = uq["sequence"]
-        for amostra in amostras:
-            row[amostra] = amostra_counts[amostra].get(seq, 0)
-        data_matrix.append(row)
+    sidecar = read_taxonomy_sidecar(sidecar_path) if sidecar_path else {}
+
+    conn = taxonomy_map = None
+    if db_path:
+        from Modules.database import connect, clear_sample_counts, taxonomy_by_digest, BulkLoader
+        from Modules.encoding import sequence_digest
+        conn = connect(db_path)
+        taxonomy_map = taxonomy_by_digest(conn)
+    try:
+        with (BulkLoader(conn) if conn is not None else nullcontext()) as loader:
+            if conn is not None:
+                clear_sample_counts(conn, "raw")
+            data_matrix = []
+            for uq in uniques:
+                row = {
+                    "taxonomy": sidecar.get(str(uq.get("ID")), uq.get("taxonomy")),
+                    "ID": uq.get("ID"),
+                    "sequence": uq.get("sequence")
+                }
+                key = encode_sequence(uq["sequence"])
+                if conn is not None:
+                    digest = sequence_digest(uq["sequence"])
+                    row["taxonomy"] = taxonomy_map.get(digest, row["taxonomy"])
+                for amostra in amostras:
+                    row[amostra] = amostra_counts[amostra].get(key, 0)
+                    if conn is not None and row[amostra]:
+                        loader.add_sample_count(digest, amostra, row[amostra], "raw")
+                data_matrix.append(row)
+    finally:
+        if conn is not None:
+            conn.close()
     df = pd.DataFrame(data_matrix)
     csv_path = os.path.join("assets", "Collections", "unique_occurrence_matrix.csv")
     df.to_csv(csv_path, index=False)
@@ -0,0 +1,310 @@
+# Modules/shard.py
+
+"""
+shard.py
+Shards de dereplicação mescláveis, para dividir uma corrida entre várias máquinas.
+
+Cada nó gera um shard compacto (gzip) com as sequências únicas que viu, ordenadas por
+digest (sequence_digest), e as contagens por amostra:
+
+    linha 1: cabeçalho JSON {"format": "projeto-a-shard", "version": 2, "source": ..., "samples": [...]}
+    demais:  digest <TAB> sequência <TAB> ID em JSON <TAB> {"amostra": contagem, ...}
+
+O ID vai como string JSON (ou null): cabeçalhos FASTA inteiros podem conter TABs. Shards
+da versão 1 (ID cru) continuam legíveis.
+
+O comando merge combina qualquer número de shards com um merge k-way em streaming
+(heapq.merge), sem reler as leituras brutas, e produz o conjunto único global
+(JSONs em assets/Collections/Unique) e a matriz de abundância (CSV).
+
+Fontes de shard:
+ - "cleaned": JSONs de Sequences_cleaned (define o conjunto de sequências únicas)
+ - "raw": arquivos de Raw_sequences/{amostra} (contagens de leituras brutas para a matriz,
+          como em count_unique_sequences_in_raw_fast)
+
+Uso:
+    python -m Modules.shard build cleaned assets/Collections/Sequences_cleaned node1.cleaned.shard.gz
+    python -m Modules.shard build raw assets/Collections/Raw_sequences node1.raw.shard.gz
+    python -m Modules.shard merge node*.shard.gz --output-dir assets/Collections/Unique
+"""
+
+from Install.Libs.LIB import MODULES
+os = MODULES["os"]
+json = MODULES["json"]
+
+import csv
+import gzip
+import heapq
+import socket
+from contextlib import nullcontext
+from itertools import groupby
+
+from Modules.unique import dereplicate_sorted, iter_cleaned_records, write_unique_json, staged_output_directory
+from Modules.search import yield_cleaned_sequences_from_file
+
+SHARD_FORMAT = "projeto-a-shard"
+SHARD_VERSION = 2
+_READABLE_VERSIONS = (1, 2)
+SOURCES = ("cleaned", "raw")
+
+
+def _iter_raw_records(raw_dir):
+    """
+    Gera (sequence, ID, size, sample_name) de cada leitura em raw_dir/{amostra}/*, cortada
+    como na limpeza para casar com o shard "cleaned".
+    """
+    for amostra in sorted(os.listdir(raw_dir)):
+        amostra_dir = os.path.join(raw_dir, amostra)
+        if not os.path.isdir(amostra_dir):
+            continue
+        for arquivo in sorted(os.listdir(amostra_dir)):
+            for seq in yield_cleaned_sequences_from_file(os.path.join(amostra_dir, arquivo)):
+                yield seq, None, len(seq), amostra
+
+
+def _list_samples(input_directory, source):
+    if source == "raw":
+        return sorted(d for d in os.listdir(input_directory) if os.path.isdir(os.path.join(input_directory, d)))
+    return None
+
+
+def _finish_shard(shard_path, body_path, source, samples, count):
+    """Grava cabeçalho + corpo (temporário, já ordenado) no shard final e remove o temporário."""
+    header = {
+        "format": SHARD_FORMAT,
+        "version": SHARD_VERSION,
+        "source": source,
+        "samples": sorted(str(s) for s in samples),
+        "node": socket.gethostname(),
+        "sequences": count,
+    }
+    with gzip.open(shard_path, "wt", compresslevel=6) as out:
+        out.write(json.dumps(header) + "\n")
+        with gzip.open(body_path, "rt") as body:
+            for line in body:
+                out.write(line)
+    os.remove(body_path)
+
+
+def _shard_line(digest, sequence, seq_id, counts):
+    if "\t" in sequence or "\n" in sequence:
+        raise ValueError(f"Sequência com TAB/quebra de linha não cabe em um shard (digest {digest}).")
+    return (f"{digest}\t{sequence}\t{json.dumps(seq_id)}\t"
+            f"{json.dumps(counts, separators=(',', ':'))}\n")
+
+
+def build_shard(input_directory, shard_path, source="cleaned", memory_budget_mb=None, workers=1, spill_dir=None):
+    """
+    Gera um shard de dereplicação a partir de um diretório local.
+
+    Args:
+        input_directory (str): Sequences_cleaned (source="cleaned") ou Raw_sequences (source="raw").
+        shard_path (str): Arquivo de saída (.shard.gz).
+        source (str): "cleaned" ou "raw".
+        memory_budget_mb (float): Se definido, deduplica em disco (ver dereplicate_sorted).
+        workers (int): Processos para deduplicar os buckets em paralelo.
+        spill_dir (str): Diretório para os buckets temporários.
+
+    Returns:
+        int: Número de sequências únicas no shard.
+    """
+    if source not in SOURCES:
+        raise ValueError(f"Fonte de shard inválida: '{source}' (use {SOURCES}).")
+    stats = {"processed_files": 0}
+    if source == "cleaned":
+        records = iter_cleaned_records(input_directory, os, json, stats)
+    else:
+        records = _iter_raw_records(input_directory)
+
+    out_dir = os.path.dirname(shard_path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    tmp_path = shard_path + ".tmp"
+    samples = set(_list_samples(input_directory, source) or [])
+    count = 0
+    # O cabeçalho precisa da lista de amostras, que só é conhecida ao fim: escreve o corpo
+    # em um arquivo temporário e depois concatena cabeçalho + corpo no shard final.
+    with gzip.open(tmp_path, "wt", compresslevel=6) as body:
+        for digest, sequence, seq_id, seq_len, sample_name, counts in dereplicate_sorted(
+                records, memory_budget_mb, workers=workers, spill_dir=spill_dir):
+            samples.update(counts)
+            body.write(_shard_line(digest, sequence, seq_id, counts))
+            count += 1
+    _finish_shard(shard_path, tmp_path, source, samples, count)
+    print(f"[INFO] Shard '{source}' com {count} sequências únicas salvo em: {shard_path}")
+    return count
+
+
+def read_shard_header(shard_path):
+    with gzip.open(shard_path, "rt") as f:
+        header = json.loads(f.readline())
+    if header.get("format") != SHARD_FORMAT:
+        raise ValueError(f"'{shard_path}' não é um shard de dereplicação.")
+    if header.get("version") not in _READABLE_VERSIONS:
+        raise ValueError(f"Versão de shard não suportada em '{shard_path}': {header.get('version')}")
+    return header
+
+
+def iter_shard(shard_path, tag=None):
+    """Gera (digest, tag, sequência, ID, contagens) de um shard, em ordem de digest."""
+    with gzip.open(shard_path, "rt") as f:
+        json_ids = json.loads(f.readline()).get("version", 1) >= 2
+        for line in f:
+            digest, sequence, seq_id, counts = line.rstrip("\n").split("\t", 3)
+            seq_id = json.loads(seq_id) if json_ids else seq_id or None
+            yield digest, tag, sequence, seq_id, json.loads(counts)
+
+
+def merge_shards(shard_paths, output_directory="assets/Collections/Unique",
+                 matrix_path=os.path.join("assets", "Collections", "unique_occurrence_matrix.csv"),
+                 output_shard=None, db_path=None, output_raw_shard=None):
+    """
+    Mescla shards (k-way, em streaming) no conjunto único global e na matriz de abundância.
+
+    O conjunto único vem dos shards "cleaned" (ou dos "raw", se não houver "cleaned").
+    As contagens da matriz vêm dos shards "raw" quando existirem (como em
+    count_unique_sequences_in_raw_fast); senão, das contagens dos próprios shards "cleaned".
+
+    Args:
+        shard_paths (list): Caminhos dos shards.
+        output_directory (str): Onde gravar um JSON por sequência única (None para não gravar).
+        matrix_path (str): CSV da matriz de abundância (None para não gravar).
+        output_shard (str): Se definido, grava também o resultado como um novo shard "cleaned",
+                            permitindo merges hierárquicos. Ele leva só as contagens "cleaned".
+        db_path (str): Se definido, carrega também o índice SQLite (Modules/database.py) com as
+                       únicas, as contagens 'cleaned' e as da matriz ('raw'), em uma transação.
+        output_raw_shard (str): Se definido (e houver shards "raw"), grava as contagens "raw"
+                                mescladas em um novo shard "raw". Use junto com output_shard em
+                                merges hierárquicos para não perder a fonte da matriz.
+
+    Returns:
+        int: Número de sequências únicas globais.
+    """
+    headers = [read_shard_header(p) for p in shard_paths]
+    has_cleaned = any(h["source"] == "cleaned" for h in headers)
+    has_raw = any(h["source"] == "raw" for h in headers)
+    unique_source = "cleaned" if has_cleaned else "raw"
+    count_source = "raw" if has_raw else "cleaned"
+    samples = sorted({s for h in headers if h["source"] == count_source for s in h["samples"]})
+
+    streams = [iter_shard(p, h["source"]) for p, h in zip(shard_paths, headers)]
+    merged = heapq.merge(*streams, key=lambda rec: rec[0])
+
+    matrix_file = writer = None
+    if matrix_path:
+        matrix_dir = os.path.dirname(matrix_path)
+        if matrix_dir:
+            os.makedirs(matrix_dir, exist_ok=True)
+        matrix_file = open(matrix_path, "w", newline="")
+        writer = csv.writer(matrix_file)
+        writer.writerow(["taxonomy", "ID", "sequence"] + samples)
+    shard_out = raw_shard_out = None
+    if output_shard:
+        shard_out = gzip.open(output_shard + ".tmp", "wt", compresslevel=6)
+    if output_raw_shard and has_raw:
+        raw_shard_out = gzip.open(output_raw_shard + ".tmp", "wt", compresslevel=6)
+    unique_samples = set()
+    raw_samples = set(samples) if has_raw else set()
+    raw_total = 0
+    conn = None
+    if db_path:
+        from Modules.database import connect, clear_uniques, clear_sample_counts, BulkLoader
+        conn = connect(db_path)
+
+    total = 0
+    try:
+        # O diretório de únicas é montado em um temporário e substitui o anterior ao final.
+        with (staged_output_directory(output_directory) if output_directory else nullcontext()) as unique_dir, \
+                (BulkLoader(conn) if conn is not None else nullcontext()) as loader:
+            if conn is not None:
+                clear_uniques(conn)
+                if has_raw:
+                    clear_sample_counts(conn, "raw")
+            for digest, group in groupby(merged, key=lambda rec: rec[0]):
+                sequence = seq_id = None
+                unique_counts = {}
+                matrix_counts = {}
+                in_unique_set = False
+                for _, tag, seq, rec_id, counts in group:
+                    sequence = sequence or seq
+                    if tag == unique_source:
+                        in_unique_set = True
+                        seq_id = seq_id or rec_id
+                        for sample, n in counts.items():
+                            unique_counts[sample] = unique_counts.get(sample, 0) + n
+                    if tag == count_source:
+                        for sample, n in counts.items():
+                            matrix_counts[sample] = matrix_counts.get(sample, 0) + n
+                if raw_shard_out is not None and matrix_counts and count_source == "raw":
+                    raw_samples.update(matrix_counts)
+                    raw_shard_out.write(_shard_line(digest, sequence, None, matrix_counts))
+                    raw_total += 1
+                if not in_unique_set:
+                    continue
+                seq_id = seq_id or digest
+                data = {
+                    "ID": seq_id,
+                    "sequence": sequence,
+                    "size": len(sequence),
+                    "sample_name": min(unique_counts) if unique_counts else None,
+                    "sample_counts": unique_counts
+                }
+                json_filename = write_unique_json(unique_dir, total, data, os, json) if output_directory else None
+                if loader is not None:
+                    loader.add_unique(data, json_filename or None, digest)
+                    if has_raw:
+                        for sample, n in matrix_counts.items():
+                            loader.add_sample_count(digest, sample, n, "raw")
+                if writer is not None:
+                    writer.writerow([None, seq_id, sequence] + [matrix_counts.get(s, 0) for s in samples])
+                if shard_out is not None:
+                    unique_samples.update(unique_counts)
+                    shard_out.write(_shard_line(digest, sequence, seq_id, unique_counts))
+                total += 1
+    finally:
+        if conn is not None:
+            conn.close()
+        if matrix_file is not None:
+            matrix_file.close()
+        if shard_out is not None:
+            shard_out.close()
+        if raw_shard_out is not None:
+            raw_shard_out.close()
+
+    if output_shard:
+        _finish_shard(output_shard, output_shard + ".tmp", "cleaned", unique_samples, total)
+    if raw_shard_out is not None:
+        _finish_shard(output_raw_shard, output_raw_shard + ".tmp", "raw", raw_samples, raw_total)
+
+    print(f"[INFO] {len(shard_paths)} shards mesclados: {total} sequências únicas globais.")
+    if matrix_path:
+        print(f"[INFO] Matriz de abundância salva em: {matrix_path}")
+    return total
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Shards de dereplicação para execuções em várias máquinas.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help="Gera o shard deste nó.")
+    p_build.add_argument("source", choices=SOURCES)
+    p_build.add_argument("input_directory")
+    p_build.add_argument("shard_path")
+    p_build.add_argument("--memory-budget", type=float, default=None, help="MB por bucket (modo em disco).")
+    p_build.add_argument("--workers", type=int, default=1)
+
+    p_merge = sub.add_parser("merge", help="Mescla shards no conjunto único global e na matriz.")
+    p_merge.add_argument("shards", nargs="+")
+    p_merge.add_argument("--output-dir", default="assets/Collections/Unique")
+    p_merge.add_argument("--matrix", default=os.path.join("assets", "Collections", "unique_occurrence_matrix.csv"))
+    p_merge.add_argument("--output-shard", default=None)
+    p_merge.add_argument("--output-raw-shard", default=None, help="Shard 'raw' com as contagens da matriz mescladas.")
+    p_merge.add_argument("--db", default=None, help="Índice SQLite a carregar (ex.: assets/Collections/sequences.sqlite).")
+
+    a = parser.parse_args()
+    if a.command == "build":
+        build_shard(a.input_directory, a.shard_path, a.source, a.memory_budget, a.workers)
+    else:
+        merge_shards(a.shards, a.output_dir, a.matrix, a.output_shard, a.db, a.output_raw_shard)
@@ -4,16 +4,54 @@ from Install.Libs.LIB import MODULES
 os = MODULES["os"]
 json = MODULES["json"]
 
-def aggregate_unique_sequences(input_directory="assets/Collections/Sequences_cleaned", output_directory="assets/Collections/Unique", imported_modules=None):
+import shutil
+import tempfile
+from array import array
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ProcessPoolExecutor
+
+from Modules.encoding import encode_sequence, decode_sequence, sequence_digest
+
+# Fator entre o tamanho em disco de um bucket e a memória que ele ocupa ao ser deduplicado
+# em um dict Python (objetos str/int/dict por registro).
+_BUCKET_MEMORY_FACTOR = 4
+# Máximo de buckets abertos ao mesmo tempo (limite de descritores de arquivo).
+_MAX_PARTITIONS = 512
+# Espaço de chaves de particionamento: os 64 bits iniciais do digest.
+_KEY_SPACE = 1 << 64
+# Profundidade máxima de reparticionamento de um bucket grande demais.
+_MAX_SPLIT_DEPTH = 4
+
+
+def aggregate_unique_sequences(input_directory="assets/Collections/Sequences_cleaned", output_directory="assets/Collections/Unique", imported_modules=None,
+                               memory_budget_mb=None, partitions=64, workers=1, spill_dir=None, db_path=None,
+                               mp_context=None):
     """
     Lê todos os arquivos JSON de sequências limpas (recursivo em subdiretórios),
     agrega apenas sequências únicas e salva CADA SEQUÊNCIA ÚNICA em arquivo JSON separado
-    em 'output_directory'.
+    em 'output_directory'. Cada JSON único traz também 'sample_counts' ({amostra: ocorrências}).
+
+    O diretório de saída é substituído por inteiro a cada execução (ver
+    staged_output_directory): JSONs de execuções anteriores não sobram nele.
+
+    Com memory_budget_mb definido, usa o modo em disco (out-of-core): os registros são
+    particionados por hash da sequência em buckets no disco, cada bucket é deduplicado de
+    forma independente (em paralelo com workers > 1) e os resultados são mesclados.
 
     Args:
         input_directory (str): Diretório raiz com arquivos JSON das sequências limpas (por amostra).
         output_directory (str): Diretório onde cada sequência única será salva como arquivo JSON individual.
         imported_modules (dict): Dicionário de módulos, se diferente do padrão.
+        memory_budget_mb (float): Memória máxima por bucket no modo em disco (None = tudo em memória).
+        partitions (int): Número inicial de buckets no modo em disco.
+        workers (int): Processos para deduplicar os buckets em paralelo.
+        spill_dir (str): Diretório para os buckets temporários (padrão: diretório temporário do sistema).
+        db_path (str): Se definido, (re)carrega também o índice SQLite (Modules/database.py)
+                       com as sequências únicas e suas sample_counts, em uma única transação.
+        mp_context: Contexto de multiprocessing dos workers (ex.: "spawn" em processos com threads).
+
+    Returns:
+        int: Número de sequências únicas salvas.
     """
     if imported_modules is not None:
         os_mod = imported_modules.get("os")
@@ -22,15 +60,64 @@ def aggregate_unique_sequences(input_directory="assets/Collections/Sequences_cle
         os_mod = os
         json_mod = json
 
-    unique_sequences = {}
-    processed_files_count = 0
-    
-    # Cria diretório de saída se não existir
-    if not os_mod.path.exists(output_directory):
-        os_mod.makedirs(output_directory)
-
     print(f"Agregando sequências únicas (polidas) do diretório: {input_directory}")
 
+    stats = {"processed_files": 0}
+    conn = None
+    if db_path:
+        from Modules.database import connect, clear_uniques, BulkLoader
+        conn = connect(db_path)
+    try:
+        with staged_output_directory(output_directory) as staging_dir, \
+                (BulkLoader(conn) if conn is not None else nullcontext()) as loader:
+            if conn is not None:
+                clear_uniques(conn)
+            unique_total, unique_count = _aggregate(
+                input_directory, staging_dir, os_mod, json_mod, stats,
+                memory_budget_mb, partitions, workers, spill_dir, loader, mp_context)
+    finally:
+        if conn is not None:
+            conn.close()
+
+    print(f"Processados {stats['processed_files']} arquivos JSON.")
+    print(f"Total de sequências únicas encontradas: {unique_total}")
+    print(f"Sequências únicas salvas individualmente em '{output_directory}': {unique_count} arquivos.")
+    if db_path:
+        print(f"Índice SQLite atualizado: {db_path}")
+    return unique_count
+
+
+@contextmanager
+def staged_output_directory(output_directory):
+    """
+    Gera um diretório temporário ao lado de output_directory; ao sair sem erro, ele toma o
+    lugar de output_directory (o antigo é removido), de modo que o resultado contém só os
+    arquivos desta execução. Em caso de erro o diretório antigo fica intacto.
+    """
+    import uuid
+    parent = os.path.dirname(os.path.abspath(output_directory))
+    os.makedirs(parent, exist_ok=True)
+    # os.mkdir (e não mkdtemp, que cria com 0700) aplica a umask como um makedirs comum,
+    # sem ler/alterar a umask do processo, que é compartilhada com as outras threads.
+    staging = os.path.join(parent, f"{os.path.basename(os.path.normpath(output_directory))}.new-{uuid.uuid4().hex[:12]}")
+    os.mkdir(staging)
+    try:
+        yield staging
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    if os.path.isdir(output_directory):
+        os.chmod(staging, os.stat(output_directory).st_mode & 0o7777)
+        old = staging + ".old"
+        os.rename(output_directory, old)
+        os.rename(staging, output_directory)
+        shutil.rmtree(old, ignore_errors=True)
+    else:
+        os.rename(staging, output_directory)
+
+
+def iter_cleaned_records(input_directory, os_mod, json_mod, stats):
+    """Gera (sequence, ID, size, sample_name) de cada JSON de sequência limpa."""
     # Busca recursiva em todos subdiretórios
     for root, dirs, files in os_mod.walk(input_directory):
         for filename in files:
@@ -39,37 +126,220 @@ def aggregate_unique_sequences(input_directory="assets/Collections/Sequences_cle
                 try:
                     with open(file_path, 'r') as f:
                         data = json_mod.load(f)
-                        sequence = data.get("sequence")
-                        seq_id = data.get("ID")
-                        seq_len = data.get("size")
-                        sample_name = data.get("sample_name")
-                        # Garante unicidade pela sequência
-                        if sequence and sequence not in unique_sequences:
-                            unique_sequences[sequence] = {
-                                "ID": seq_id,
-                                "sequence": sequence,
-                                "size": seq_len,
-                                "sample_name": sample_name
-                            }
-                    processed_files_count += 1
+                    stats["processed_files"] += 1
                 except json_mod.JSONDecodeError:
                     print(f"Aviso: Arquivo '{filename}' não é um JSON válido. Ignorando.")
+                    continue
                 except Exception as e:
                     print(f"Erro ao processar '{filename}': {e}")
+                    continue
+                sequence = data.get("sequence")
+                if sequence:
+                    yield sequence, data.get("ID"), data.get("size"), data.get("sample_name")
+
+
+def write_unique_json(output_directory, idx, data, os_mod, json_mod):
+    """Salva uma sequência única; retorna o nome do arquivo (ou False em caso de erro)."""
+    safe_id = "".join([c if c.isalnum() else "_" for c in str(data["ID"])])
+    json_filename = f"unique_{safe_id}_{idx}.json"
+    json_path = os_mod.path.join(output_directory, json_filename)
+    try:
+        with open(json_path, 'w') as out_f:
+            json_mod.dump(data, out_f, indent=4)
+        return json_filename
+    except Exception as e:
+        print(f"Erro ao salvar sequência única '{data['ID']}': {e}")
+        return False
+
+
+class _InMemoryUniques:
+    """
+    Deduplicação em memória com custo fixo baixo por sequência única: a chave em codificação
+    2-bit (Modules/encoding.py) aponta para um ordinal, e ID/size/amostra/contagem da primeira
+    ocorrência ficam em listas e arrays paralelos. Só as ocorrências em outras amostras (raras
+    na prática) vão para um dict esparso; o dict sample_counts é montado apenas na saída.
+    """
+    def __init__(self):
+        self.index = {}                  # chave 2-bit -> ordinal
+        self.ids = []
+        self.sizes = []
+        self.samples = []                # nomes das amostras (o array guarda o ordinal)
+        self._sample_ord = {}
+        self.first_sample = array("I")
+        self.first_count = array("I")
+        self.extra_counts = {}           # (ordinal, ordinal da amostra) -> ocorrências
+
+    def add(self, sequence, seq_id, seq_len, sample_name):
+        sample = self._sample_ord.get(sample_name)
+        if sample is None:
+            sample = self._sample_ord[sample_name] = len(self.samples)
+            self.samples.append(sample_name)
+        key = encode_sequence(sequence)
+        ordinal = self.index.get(key)
+        if ordinal is None:
+            self.index[key] = len(self.ids)
+            self.ids.append(seq_id)
+            self.sizes.append(seq_len)
+            self.first_sample.append(sample)
+            self.first_count.append(1)
+        elif self.first_sample[ordinal] == sample:
+            self.first_count[ordinal] += 1
+        else:
+            extra = (ordinal, sample)
+            self.extra_counts[extra] = self.extra_counts.get(extra, 0) + 1
 
-    # Salva cada sequência única em arquivo JSON separado
+    def __iter__(self):
+        """Gera (digest, sequence, ID, size, sample_name, sample_counts) em ordem de digest."""
+        extras = {}
+        for (ordinal, sample), n in self.extra_counts.items():
+            extras.setdefault(ordinal, []).append((sample, n))
+        keys = list(self.index)
+        digests = [sequence_digest(decode_sequence(key)) for key in keys]
+        for ordinal in sorted(range(len(keys)), key=digests.__getitem__):
+            sample_name = self.samples[self.first_sample[ordinal]]
+            counts = {sample_name: self.first_count[ordinal]}
+            for sample, n in extras.get(ordinal, ()):
+                counts[self.samples[sample]] = n
+            yield (digests[ordinal], decode_sequence(keys[ordinal]), self.ids[ordinal],
+                   self.sizes[ordinal], sample_name, counts)
+
+
+def _partition_bounds(lo, hi, partitions):
+    # Faixa [início, fim) de cada bucket, coerente com i = (chave - lo) * partitions // (hi - lo).
+    width = hi - lo
+    return [(lo - (-width * i // partitions), lo - (-width * (i + 1) // partitions)) for i in range(partitions)]
+
+
+def _split_into_buckets(lines, bucket_dir, prefix, lo, hi, partitions):
+    """
+    Distribui linhas JSON [digest, ...] com chave (64 bits iniciais do digest) em [lo, hi)
+    em `partitions` faixas contíguas. O bucket i só contém chaves menores que as do
+    bucket i+1, então concatenar os buckets em ordem mantém a ordenação global.
+    Retorna [(caminho, lo, hi)] dos buckets não vazios, em ordem.
+    """
+    bounds = _partition_bounds(lo, hi, partitions)
+    paths = [os.path.join(bucket_dir, f"{prefix}_{i:04d}.jsonl") for i in range(partitions)]
+    handles = {}
+    try:
+        for line in lines:
+            key = int(line[2:18], 16)  # linha começa com ["<digest de 32 hex>", ...
+            i = (key - lo) * partitions // (hi - lo)
+            handle = handles.get(i)
+            if handle is None:
+                handle = handles[i] = open(paths[i], "w")
+            handle.write(line)
+    finally:
+        for handle in handles.values():
+            handle.close()
+    return [(paths[i], bounds[i][0], bounds[i][1]) for i in sorted(handles)]
+
+
+def _dedup_bucket(args):
+    """
+    Deduplica um bucket e grava os únicos, ordenados por digest, em out_path.
+    Buckets maiores que o orçamento são reparticionados em faixas menores da mesma chave.
+    Retorna (out_path, nº de únicos).
+    """
+    bucket_path, out_path, budget_bytes, lo, hi, depth = args
+    size = os.path.getsize(bucket_path) * _BUCKET_MEMORY_FACTOR
+    if size > budget_bytes and depth < _MAX_SPLIT_DEPTH and hi - lo > 1:
+        sub_partitions = int(min(_MAX_PARTITIONS, hi - lo, 2 * (size // budget_bytes + 1)))
+        with open(bucket_path) as f:
+            subs = _split_into_buckets(f, os.path.dirname(bucket_path),
+                                       os.path.basename(bucket_path)[:-6], lo, hi, sub_partitions)
+        os.remove(bucket_path)
+        total = 0
+        with open(out_path, "w") as out:
+            for sub_path, sub_lo, sub_hi in subs:
+                sub_out = sub_path + ".uniq"
+                _, n = _dedup_bucket((sub_path, sub_out, budget_bytes, sub_lo, sub_hi, depth + 1))
+                with open(sub_out) as f:
+                    shutil.copyfileobj(f, out)
+                os.remove(sub_out)
+                total += n
+        return out_path, total
+
+    uniques = {}
+    with open(bucket_path) as f:
+        for line in f:
+            digest, sequence, seq_id, seq_len, sample_name = json.loads(line)
+            entry = uniques.get(digest)
+            if entry is None:
+                uniques[digest] = [sequence, seq_id, seq_len, sample_name, {sample_name: 1}]
+            else:
+                counts = entry[4]
+                counts[sample_name] = counts.get(sample_name, 0) + 1
+    with open(out_path, "w") as out:
+        for digest in sorted(uniques):
+            out.write(json.dumps([digest] + uniques[digest]) + "\n")
+    os.remove(bucket_path)
+    return out_path, len(uniques)
+
+
+def dereplicate_sorted(records, memory_budget_mb=None, partitions=64, workers=1, spill_dir=None, mp_context=None):
+    """
+    Deduplica um iterável de (sequence, ID, size, sample_name) e gera, em ordem crescente de
+    digest (sequence_digest), tuplas (digest, sequence, ID, size, sample_name, sample_counts),
+    onde ID/size/sample_name são da primeira ocorrência.
+
+    Sem memory_budget_mb tudo é feito em memória; com ele, os registros são particionados
+    em buckets no disco e cada bucket é deduplicado de forma independente (em paralelo com
+    workers > 1). A ordem por digest é a mesma em qualquer máquina, o que permite mesclar
+    resultados de nós diferentes (ver Modules/shard.py).
+    """
+    if memory_budget_mb is None:
+        uniques = _InMemoryUniques()
+        for sequence, seq_id, seq_len, sample_name in records:
+            uniques.add(sequence, seq_id, seq_len, sample_name)
+        yield from uniques
+        return
+
+    budget_bytes = max(1, int(memory_budget_mb * 1024 * 1024))
+    partitions = max(1, min(_MAX_PARTITIONS, partitions))
+    work_dir = tempfile.mkdtemp(prefix="unique_spill_", dir=spill_dir)
+    try:
+        # 1) Particiona os registros em buckets no disco pelo digest da sequência
+        def spill_lines():
+            for sequence, seq_id, seq_len, sample_name in records:
+                yield json.dumps([sequence_digest(sequence), sequence, seq_id, seq_len, sample_name]) + "\n"
+        buckets = _split_into_buckets(spill_lines(), work_dir, "bucket", 0, _KEY_SPACE, partitions)
+        print(f"[INFO] {len(buckets)} buckets gravados em '{work_dir}' (orçamento: {memory_budget_mb} MB).")
+
+        # 2) Deduplica cada bucket de forma independente (em paralelo se workers > 1)
+        jobs = [(p, p + ".uniq", budget_bytes, lo, hi, 0) for p, lo, hi in buckets]
+        if workers and workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as executor:
+                results = list(executor.map(_dedup_bucket, jobs))
+        else:
+            results = [_dedup_bucket(job) for job in jobs]
+
+        # 3) Mescla: percorre os buckets em ordem (já ordenados por digest)
+        for out_path, _ in results:
+            with open(out_path) as f:
+                for line in f:
+                    yield tuple(json.loads(line))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _aggregate(input_directory, output_directory, os_mod, json_mod, stats,
+               memory_budget_mb, partitions, workers, spill_dir, loader=None, mp_context=None):
+    records = iter_cleaned_records(input_directory, os_mod, json_mod, stats)
+    unique_total = 0
     unique_count = 0
-    for idx, (sequence, data) in enumerate(unique_sequences.items()):
-        safe_id = "".join([c if c.isalnum() else "_" for c in data["ID"]])
-        json_filename = f"unique_{safe_id}_{idx}.json"
-        json_path = os_mod.path.join(output_directory, json_filename)
-        try:
-            with open(json_path, 'w') as out_f:
-                json_mod.dump(data, out_f, indent=4)
+    for digest, sequence, seq_id, seq_len, sample_name, counts in dereplicate_sorted(
+            records, memory_budget_mb, partitions, workers, spill_dir, mp_context):
+        data = {
+            "ID": seq_id,
+            "sequence": sequence,
+            "size": seq_len,
+            "sample_name": sample_name,
+            "sample_counts": counts
+        }
+        json_filename = write_unique_json(output_directory, unique_total, data, os_mod, json_mod)
+        if json_filename:
             unique_count += 1
-        except Exception as e:
-            print(f"Erro ao salvar sequência única '{data['ID']}': {e}")
-
-    print(f"Processados {processed_files_count} arquivos JSON.")
-    print(f"Total de sequências únicas encontradas: {len(unique_sequences)}")
-    print(f"Sequências únicas salvas individualmente em '{output_directory}': {unique_count} arquivos.")
+            if loader is not None:
+                loader.add_unique(data, json_filename, digest)
+        unique_total += 1
+    return unique_total, unique_count
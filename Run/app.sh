@@ -0,0 +1,7 @@
+#!/usr/bin/env bash
+# Run/app.sh --- Sobe o serviço local do pipeline (ver Interface/interface.py).
+# Uso: Run/app.sh [--port 8765] [--workers 2] [--queue 16] [--blast-db /caminho/banco]
+set -euo pipefail
+
+cd "$(dirname "$0")/.."
+exec "${PYTHON:-python3}" -m Interface.interface "$@"
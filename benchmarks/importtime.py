@@ -0,0 +1,80 @@
+# benchmarks/importtime.py
+
+"""
+importtime.py
+Mede o tempo de importação dos módulos do projeto com `python -X importtime`,
+em um interpretador novo por módulo (sem cache de sys.modules).
+
+Uso:
+    python benchmarks/importtime.py                 # módulos padrão
+    python benchmarks/importtime.py Modules.quality --top 10
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = [
+    "Install.Libs.LIB",
+    "Modules.check",
+    "Modules.quality",
+    "Modules.unique",
+    "Modules.search",
+    "Modules.main",
+]
+
+
+def parse_importtime(stderr):
+    """
+    Converte a saída de -X importtime em lista de (self_us, cumulative_us, nome).
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            entries.append((int(parts[0]), int(parts[1]), parts[2].strip()))
+        except ValueError:
+            continue
+    return entries
+
+
+def measure_import_time(module, python=sys.executable):
+    """
+    Importa `module` em um subprocesso com -X importtime.
+    Retorna (cumulative_us do módulo, entradas) ou (None, entradas) se a importação falhar.
+    """
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+    )
+    entries = parse_importtime(result.stderr)
+    if result.returncode != 0:
+        return None, entries
+    cumulative = next((cum for _, cum, name in entries if name == module), None)
+    return cumulative, entries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tempo de importação (-X importtime) por módulo.")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--top", type=int, default=5, help="Mostra as N dependências mais caras.")
+    args = parser.parse_args(argv)
+    for module in args.modules:
+        cumulative, entries = measure_import_time(module)
+        if cumulative is None:
+            print(f"{module}: falha ao importar")
+            continue
+        print(f"{module}: {cumulative / 1000:.1f} ms")
+        for self_us, cum_us, name in sorted(entries, key=lambda e: e[0], reverse=True)[:args.top]:
+            print(f"    {name.strip():40s} self {self_us / 1000:7.1f} ms  cumulativo {cum_us / 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
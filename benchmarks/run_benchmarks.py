@@ -0,0 +1,389 @@
+# benchmarks/run_benchmarks.py
+
+"""
+run_benchmarks.py
+Suíte reprodutível de benchmarks das funções públicas do pipeline.
+
+Gera um conjunto de dados sintético (benchmarks/synthetic.py) em um diretório temporário,
+mede cada função e acrescenta o resultado em benchmarks/results/history.jsonl.
+Cada execução é comparada com a última execução de mesma configuração; tempos acima da
+tolerância são marcados como regressão (e --fail-on-regression faz o processo sair com 1).
+
+Uso:
+    python benchmarks/run_benchmarks.py --reads 2000 --samples 2 --repeat 3
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+if BENCH_DIR not in sys.path:
+    sys.path.insert(0, BENCH_DIR)
+
+from synthetic import generate_samples, generate_fasta
+from importtime import DEFAULT_MODULES, measure_import_time
+
+HISTORY_PATH = os.path.join(BENCH_DIR, "results", "history.jsonl")
+
+BENCHMARKS = []
+
+
+class SkipBenchmark(Exception):
+    """Levantada quando uma etapa anterior (que prepara os dados) não pôde rodar."""
+
+
+def _require(ctx, key):
+    if not ctx[key]:
+        raise SkipBenchmark(f"sem dados de '{key}' (etapa anterior não executada)")
+
+
+def benchmark(name):
+    """
+    Registra uma função de benchmark. Ela recebe o contexto e retorna o nº de registros
+    processados, ou (registros, segundos) quando mede o próprio tempo.
+    """
+    def decorator(func):
+        BENCHMARKS.append((name, func))
+        return func
+    return decorator
+
+
+# --- Benchmarks (na ordem do pipeline; cada um pode preparar dados para o próximo) ---
+
+@benchmark("extract_fastq_sequences_and_qualities_with_ids")
+def bench_extract_fastq(ctx):
+    from Modules.quality import extract_fastq_sequences_and_qualities_with_ids
+    total = 0
+    for path in ctx["fastq_files"]:
+        ids, seqs, qs = extract_fastq_sequences_and_qualities_with_ids(path)
+        ctx["parsed"][path] = (ids, seqs, qs)
+        total += len(ids)
+    return total
+
+
+@benchmark("extract_fastq_sequences_and_qualities_with_ids[gz]")
+def bench_extract_fastq_gz(ctx):
+    from Modules.quality import extract_fastq_sequences_and_qualities_with_ids
+    total = 0
+    for path in ctx["fastq_gz_files"]:
+        total += len(extract_fastq_sequences_and_qualities_with_ids(path)[0])
+    return total
+
+
+@benchmark("extract_fasta_sequences_with_ids")
+def bench_extract_fasta(ctx):
+    from Modules.quality import extract_fasta_sequences_with_ids
+    return len(extract_fasta_sequences_with_ids(ctx["fasta_file"])[0])
+
+
+@benchmark("QualityCutter.analyze_and_set_cutoff")
+def bench_analyze_cutoff(ctx):
+    from Modules.quality import QualityCutter
+    _require(ctx, "parsed")
+    total = 0
+    for path, (ids, seqs, qs) in ctx["parsed"].items():
+        cutter = QualityCutter()
+        cutter.analyze_and_set_cutoff(qs)
+        ctx["cutters"][path] = cutter
+        total += len(qs)
+    return total
+
+
+@benchmark("QualityCutter.estimate_cutoff")
+def bench_estimate_cutoff(ctx):
+    from Modules.quality import QualityCutter, iter_fastq_records
+    total = 0
+    for path in ctx["fastq_files"]:
+        total += QualityCutter().estimate_cutoff(q for _, _, q in iter_fastq_records(path))["reads"]
+    return total
+
+
+@benchmark("QualityCutter.iter_cut_records")
+def bench_cut(ctx):
+    _require(ctx, "cutters")
+    total = 0
+    for path, (ids, seqs, qs) in ctx["parsed"].items():
+        # iter_cut_records mantém cada ID junto da sua leitura (leituras vazias são descartadas)
+        records = list(ctx["cutters"][path].iter_cut_records(zip(ids, seqs, qs)))
+        ctx["cut"][path] = tuple(map(list, zip(*records))) if records else ([], [], [])
+        total += len(seqs)
+    return total
+
+
+@benchmark("export_cut_sequences_to_json")
+def bench_export(ctx):
+    from Modules.quality import export_cut_sequences_to_json
+    _require(ctx, "cut")
+    shutil.rmtree(os.path.join("assets", "Collections", "Sequences_cleaned"), ignore_errors=True)
+    total = 0
+    for path, (ids_filt, seqs_filt, qs_filt) in ctx["cut"].items():
+        sample = os.path.basename(os.path.dirname(path))
+        export_cut_sequences_to_json(ids_filt, seqs_filt, qs_filt, path, sample_name=sample)
+        total += len(seqs_filt)
+    return total
+
+
+@benchmark("aggregate_unique_sequences")
+def bench_aggregate(ctx):
+    from Modules.unique import aggregate_unique_sequences
+    if not os.path.isdir(os.path.join("assets", "Collections", "Sequences_cleaned")):
+        raise SkipBenchmark("sem sequências limpas (export_cut_sequences_to_json não executado)")
+    shutil.rmtree(os.path.join("assets", "Collections", "Unique"), ignore_errors=True)
+    aggregate_unique_sequences(
+        input_directory=os.path.join("assets", "Collections", "Sequences_cleaned"),
+        output_directory=os.path.join("assets", "Collections", "Unique"),
+    )
+    return len(os.listdir(os.path.join("assets", "Collections", "Unique")))
+
+
+@benchmark("aggregate_unique_sequences[out-of-core]")
+def bench_aggregate_external(ctx):
+    from Modules.unique import aggregate_unique_sequences
+    if not os.path.isdir(os.path.join("assets", "Collections", "Sequences_cleaned")):
+        raise SkipBenchmark("sem sequências limpas (export_cut_sequences_to_json não executado)")
+    out_dir = os.path.join("assets", "Collections", "Unique_external")
+    shutil.rmtree(out_dir, ignore_errors=True)
+    aggregate_unique_sequences(
+        input_directory=os.path.join("assets", "Collections", "Sequences_cleaned"),
+        output_directory=out_dir,
+        memory_budget_mb=1,
+        partitions=16,
+    )
+    return len(os.listdir(out_dir))
+
+
+@benchmark("count_unique_sequences_in_raw_fast")
+def bench_count(ctx):
+    from Modules.search import count_unique_sequences_in_raw_fast
+    df = count_unique_sequences_in_raw_fast(
+        unique_dir=os.path.join("assets", "Collections", "Unique"),
+        raw_dir=ctx["raw_dir"],
+    )
+    return len(df)
+
+
+@benchmark("convert_to_fasta")
+def bench_convert(ctx):
+    from Modules.check import convert_to_fasta
+    out_dir = os.path.join("assets", "Collections", "Fasta")
+    for path in ctx["fastq_files"]:
+        convert_to_fasta(path, out_dir, {"os": os})
+    return ctx["reads_total"]
+
+
+def _register_parse_benchmark(backend):
+    @benchmark(f"mercadolivre.parse_listing[{backend}]")
+    def bench_parse(ctx):
+        from Modules.mercadolivre import parse_listing, available_backends, FIXTURES_DIR
+        if backend not in available_backends():
+            raise SkipBenchmark(f"backend '{backend}' não instalado")
+        total = 0
+        for name in sorted(os.listdir(FIXTURES_DIR)):
+            with open(os.path.join(FIXTURES_DIR, name)) as f:
+                total += len(parse_listing(f.read(), backend))
+        return total
+
+
+for _backend in ("selectolax", "lxml", "html.parser"):
+    _register_parse_benchmark(_backend)
+
+
+@benchmark("mercadolivre.scrape[offline]")
+def bench_scrape_offline(ctx):
+    from Modules.mercadolivre import scrape, serve_fixtures
+    server, base_url = serve_fixtures()
+    try:
+        # Mede só a coleta: shutdown() espera o intervalo de polling do servidor
+        t0 = time.perf_counter()
+        records = len(scrape("notebook", paginas=2, base_url=base_url, filtrar=False))
+        return records, time.perf_counter() - t0
+    finally:
+        server.shutdown()
+
+
+def _register_import_benchmark(module):
+    @benchmark(f"import {module}")
+    def bench_import(ctx):
+        cumulative_us, _ = measure_import_time(module)
+        if cumulative_us is None:
+            raise SkipBenchmark(f"falha ao importar {module}")
+        return 1, cumulative_us / 1e6
+
+
+for _module in DEFAULT_MODULES:
+    _register_import_benchmark(_module)
+
+
+# --- Execução ---
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def prepare_dataset(workdir, config):
+    raw_dir = os.path.join(workdir, "assets", "Collections", "Raw_sequences")
+    read_kwargs = {"length_mean": config["length_mean"], "length_sd": config["length_sd"],
+                   "duplicate_rate": config["duplicate_rate"]}
+    samples = generate_samples(raw_dir, config["samples"], config["reads"], seed=config["seed"],
+                               quality_profile=config["profile"], **read_kwargs)
+    gz_dir = os.path.join(workdir, "gz")
+    gz_samples = generate_samples(gz_dir, 1, config["reads"], seed=config["seed"], use_gzip=True,
+                                  quality_profile=config["profile"], **read_kwargs)
+    fasta_file = generate_fasta(os.path.join(workdir, "synthetic.fasta"), config["reads"],
+                                seed=config["seed"], **read_kwargs)
+    fastq_files = [p for paths in samples.values() for p in paths]
+    return {
+        "raw_dir": raw_dir,
+        "fastq_files": fastq_files,
+        "fastq_gz_files": [p for paths in gz_samples.values() for p in paths],
+        "fasta_file": fasta_file,
+        "reads_total": config["reads"] * len(fastq_files),
+        "parsed": {},
+        "cutters": {},
+        "cut": {},
+    }
+
+
+def run_benchmarks(config, selected=None):
+    """Executa os benchmarks e retorna {nome: resultado}."""
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="projeto_a_bench_")
+    cwd = os.getcwd()
+    try:
+        os.chdir(workdir)
+        ctx = prepare_dataset(workdir, config)
+        for name, func in BENCHMARKS:
+            if selected and not any(s in name for s in selected):
+                continue
+            times = []
+            records = 0
+            try:
+                for _ in range(config["repeat"]):
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        t0 = time.perf_counter()
+                        records = func(ctx)
+                        elapsed = time.perf_counter() - t0
+                    if isinstance(records, tuple):
+                        records, elapsed = records
+                    times.append(elapsed)
+            except ImportError as e:
+                results[name] = {"skipped": f"dependência ausente: {e.name}"}
+                continue
+            except SkipBenchmark as e:
+                results[name] = {"skipped": str(e)}
+                continue
+            except Exception as e:
+                results[name] = {"error": f"{type(e).__name__}: {e}"}
+                continue
+            median = statistics.median(times)
+            results[name] = {
+                "median_s": median,
+                "min_s": min(times),
+                "records": records,
+                "records_per_s": records / median if median > 0 else None,
+            }
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def load_history(path=HISTORY_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare_with_previous(entry, history, tolerance):
+    """Retorna a lista de (nome, anterior, atual) com piora acima da tolerância."""
+    previous = next((h for h in reversed(history) if h.get("config") == entry["config"]), None)
+    if previous is None:
+        return [], None
+    regressions = []
+    for name, res in entry["results"].items():
+        old = previous["results"].get(name, {})
+        if "median_s" in res and "median_s" in old and old["median_s"] > 0:
+            if res["median_s"] > old["median_s"] * (1 + tolerance):
+                regressions.append((name, old["median_s"], res["median_s"]))
+    return regressions, previous
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do pipeline com dados sintéticos.")
+    parser.add_argument("--reads", type=int, default=2000, help="Leituras por arquivo.")
+    parser.add_argument("--samples", type=int, default=2, help="Número de amostras/barcodes.")
+    parser.add_argument("--length-mean", type=int, default=1500)
+    parser.add_argument("--length-sd", type=int, default=300)
+    parser.add_argument("--duplicate-rate", type=float, default=0.2)
+    parser.add_argument("--profile", default="ont", help="Perfil de qualidade: ont, illumina ou uniform.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="*", help="Executa apenas benchmarks cujo nome contenha estes termos.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Piora relativa aceita (0.2 = 20%%).")
+    parser.add_argument("--history", default=HISTORY_PATH)
+    parser.add_argument("--no-save", action="store_true", help="Não grava no histórico.")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    config = {
+        "reads": args.reads, "samples": args.samples, "length_mean": args.length_mean,
+        "length_sd": args.length_sd, "duplicate_rate": args.duplicate_rate,
+        "profile": args.profile, "seed": args.seed, "repeat": args.repeat,
+    }
+    results = run_benchmarks(config, args.only)
+    entry = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "config": config,
+        "results": results,
+    }
+
+    print(f"{'benchmark':55s} {'mediana(s)':>12s} {'reg/s':>12s}")
+    for name, res in results.items():
+        if "median_s" in res:
+            rps = f"{res['records_per_s']:.0f}" if res["records_per_s"] else "-"
+            print(f"{name:55s} {res['median_s']:12.4f} {rps:>12s}")
+        else:
+            print(f"{name:55s} {res.get('skipped') or res.get('error')}")
+
+    history = load_history(args.history)
+    regressions, previous = compare_with_previous(entry, history, args.tolerance)
+    if previous is not None:
+        print(f"\nComparado com {previous.get('commit')} ({previous.get('timestamp')}):")
+        for name, old, new in regressions:
+            print(f"  [REGRESSÃO] {name}: {old:.4f}s -> {new:.4f}s (+{100 * (new / old - 1):.0f}%)")
+        if not regressions:
+            print("  Nenhuma regressão acima da tolerância.")
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(args.history), exist_ok=True)
+        with open(args.history, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        print(f"\nResultado acrescentado em: {args.history}")
+
+    return 1 if (regressions and args.fail_on_regression) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+# benchmarks/synthetic.py
+
+"""
+synthetic.py
+Gerador determinístico (com seed) de arquivos FASTQ/FASTA sintéticos para benchmarks.
+Permite configurar:
+ - Número de leituras e distribuição de tamanho (normal truncada)
+ - Perfil de qualidade ('ont', 'illumina' ou 'uniform')
+ - Fração de leituras duplicadas (para exercitar a deduplicação)
+ - Compressão gzip
+ - Número de amostras/barcodes (uma subpasta por amostra)
+"""
+
+import gzip
+import os
+import random
+
+BASES = "ACGT"
+
+QUALITY_PROFILES = {
+    # (média Phred no início, média no fim, desvio padrão)
+    "ont": (14, 10, 4),
+    "illumina": (36, 28, 3),
+    "uniform": (20, 20, 0),
+}
+
+
+def _open_out(path, use_gzip):
+    if use_gzip:
+        return gzip.open(path, "wt", compresslevel=1)
+    return open(path, "w")
+
+
+def _read_length(rng, length_mean, length_sd, min_length, max_length):
+    length = int(rng.gauss(length_mean, length_sd)) if length_sd else length_mean
+    return max(min_length, min(max_length, length))
+
+
+def _quality_string(rng, length, profile, offset=33):
+    start, end, sd = QUALITY_PROFILES[profile]
+    chars = []
+    for i in range(length):
+        mean = start + (end - start) * i / max(1, length - 1)
+        q = int(rng.gauss(mean, sd)) if sd else int(mean)
+        chars.append(chr(max(0, min(41, q)) + offset))
+    return "".join(chars)
+
+
+def iter_synthetic_reads(n_reads, seed=0, length_mean=1500, length_sd=300, min_length=50,
+                         max_length=5000, duplicate_rate=0.2, n_rate=0.001):
+    """
+    Gera (id, sequência) deterministicamente. Uma fração duplicate_rate das leituras
+    repete uma leitura anterior, para que haja sequências não únicas.
+    """
+    rng = random.Random(seed)
+    pool = []
+    for i in range(n_reads):
+        if pool and rng.random() < duplicate_rate:
+            seq = rng.choice(pool)
+        else:
+            length = _read_length(rng, length_mean, length_sd, min_length, max_length)
+            seq = "".join(rng.choices(BASES, k=length))
+            if n_rate:
+                seq = "".join("N" if rng.random() < n_rate else b for b in seq)
+            if len(pool) < 10000:
+                pool.append(seq)
+        yield f"read_{seed}_{i}", seq
+
+
+def generate_fastq(path, n_reads, seed=0, quality_profile="ont", use_gzip=False, phred_offset=33, **read_kwargs):
+    """
+    Escreve um FASTQ sintético em path. Retorna o caminho escrito.
+    read_kwargs é repassado para iter_synthetic_reads (length_mean, length_sd, duplicate_rate...).
+    """
+    rng = random.Random(seed + 1)
+    with _open_out(path, use_gzip) as f:
+        for read_id, seq in iter_synthetic_reads(n_reads, seed=seed, **read_kwargs):
+            qual = _quality_string(rng, len(seq), quality_profile, phred_offset)
+            f.write(f"@{read_id} synthetic=1\n{seq}\n+\n{qual}\n")
+    return path
+
+
+def generate_fasta(path, n_reads, seed=0, use_gzip=False, line_width=80, **read_kwargs):
+    """Escreve um FASTA sintético (sequência quebrada em linhas de line_width)."""
+    with _open_out(path, use_gzip) as f:
+        for read_id, seq in iter_synthetic_reads(n_reads, seed=seed, **read_kwargs):
+            f.write(f">{read_id}\n")
+            for i in range(0, len(seq), line_width):
+                f.write(seq[i:i + line_width] + "\n")
+    return path
+
+
+def generate_samples(root, n_samples=2, reads_per_sample=1000, seed=0, fmt="fastq", use_gzip=False,
+                     files_per_sample=1, **kwargs):
+    """
+    Cria root/barcodeNN/... com um ou mais arquivos por amostra, no layout aceito por
+    find_valid_fastq_files. Retorna {amostra: [caminhos]}.
+    """
+    samples = {}
+    ext = ".fastq" if fmt == "fastq" else ".fasta"
+    if use_gzip:
+        ext += ".gz"
+    for s in range(n_samples):
+        sample = f"barcode{s + 1:02d}"
+        sample_dir = os.path.join(root, sample)
+        os.makedirs(sample_dir, exist_ok=True)
+        paths = []
+        for j in range(files_per_sample):
+            path = os.path.join(sample_dir, f"{sample}_{j}{ext}")
+            file_seed = seed * 1000 + s * 10 + j
+            if fmt == "fastq":
+                generate_fastq(path, reads_per_sample, seed=file_seed, use_gzip=use_gzip, **kwargs)
+            else:
+                generate_fasta(path, reads_per_sample, seed=file_seed, use_gzip=use_gzip, **kwargs)
+            paths.append(path)
+        samples[sample] = paths
+    return samples
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Gera amostras FASTQ/FASTA sintéticas.")
+    parser.add_argument("root")
+    parser.add_argument("--samples", type=int, default=2)
+    parser.add_argument("--reads", type=int, default=1000)
+    parser.add_argument("--length-mean", type=int, default=1500)
+    parser.add_argument("--length-sd", type=int, default=300)
+    parser.add_argument("--profile", choices=sorted(QUALITY_PROFILES), default="ont")
+    parser.add_argument("--format", choices=["fastq", "fasta"], default="fastq")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    a = parser.parse_args()
+    kwargs = {"length_mean": a.length_mean, "length_sd": a.length_sd}
+    if a.format == "fastq":
+        kwargs["quality_profile"] = a.profile
+    out = generate_samples(a.root, a.samples, a.reads, seed=a.seed, fmt=a.format, use_gzip=a.gzip, **kwargs)
+    print(f"Gerados {sum(len(v) for v in out.values())} arquivos em '{a.root}'.")
@@ -0,0 +1,104 @@
+# tests/test_mercadolivre.py
+# Testes da coleta do Mercado Livre sobre as páginas salvas em benchmarks/fixtures/mercadolivre.
+# Rodar da raiz do projeto: python -m pytest -q
+
+import os
+import unittest
+
+from Modules.mercadolivre import (
+    FIXTURES_DIR,
+    available_backends,
+    limpa_preco,
+    parse_listing,
+    scrape,
+    scrape_items,
+    serve_fixtures,
+)
+
+try:
+    import requests  # noqa: F401 (dependência só do download)
+    HAS_REQUESTS = True
+except ImportError:
+    HAS_REQUESTS = False
+
+
+def _fixture(nome):
+    with open(os.path.join(FIXTURES_DIR, nome), encoding="utf-8") as f:
+        return f.read()
+
+
+class ParseListingTest(unittest.TestCase):
+    def setUp(self):
+        self.html = _fixture("notebook.html")
+
+    def test_backends_extract_the_same_items(self):
+        esperado = None
+        for backend in available_backends():
+            with self.subTest(backend=backend):
+                itens = parse_listing(self.html, backend)
+                self.assertEqual(len(itens), 6)
+                if esperado is None:
+                    esperado = itens
+                self.assertEqual(itens, esperado)
+
+    def test_fields(self):
+        for backend in available_backends():
+            with self.subTest(backend=backend):
+                dell, lenovo = parse_listing(self.html, backend)[:2]
+                self.assertEqual(dell["titulo"], "Notebook Dell Inspiron 15 3520 I5 8gb 512gb Ssd 15,6")
+                self.assertEqual(dell["link"],
+                                 "https://produto.mercadolivre.com.br/MLB-3512345678-notebook-dell-inspiron-15")
+                self.assertEqual(dell["preco_atual"], "3.299,90")
+                self.assertEqual(dell["preco_anterior"], "3.999")
+                self.assertEqual(dell["preco_parcelado"], "329")
+                # Sem preço anterior: campo vazio
+                self.assertEqual(lenovo["preco_anterior"], "")
+                self.assertEqual(lenovo["preco_atual"], "2.199")
+
+    def test_invalid_backend(self):
+        with self.assertRaises(ValueError):
+            parse_listing(self.html, "inexistente")
+
+
+class LimpaPrecoTest(unittest.TestCase):
+    def test_values(self):
+        self.assertEqual(limpa_preco("3.299,90"), 3299.9)
+        self.assertEqual(limpa_preco("2.199"), 2199.0)
+        self.assertEqual(limpa_preco("49,90"), 49.9)
+
+
+@unittest.skipUnless(HAS_REQUESTS, "requests não instalado")
+class ScrapeFixturesTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server, cls.base_url = serve_fixtures()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_pages_deduplicated_and_missing_page_skipped(self):
+        # 3 páginas: a 3ª não existe (404) e é ignorada; o Dell repetido na 2ª conta uma vez
+        itens = scrape_items("notebook", paginas=3, base_url=self.base_url)
+        links = [item["link"] for item in itens]
+        self.assertEqual(len(itens), 9)
+        self.assertEqual(len(set(links)), 9)
+
+    def test_dataframe_prices(self):
+        df = scrape("notebook", paginas=3, base_url=self.base_url, filtrar=False)
+        self.assertEqual(len(df), 9)
+        dell = df[df["titulo"].str.startswith("Notebook Dell")].iloc[0]
+        self.assertEqual(dell["preco_atual"], 3299.9)
+        self.assertEqual(dell["preco_anterior"], 3999.0)
+        lenovo = df[df["titulo"].str.startswith("Notebook Lenovo")].iloc[0]
+        self.assertTrue(lenovo["preco_anterior"] != lenovo["preco_anterior"])  # NaN
+
+    def test_filtered_products(self):
+        df = scrape("notebook", paginas=3, base_url=self.base_url)
+        self.assertEqual(len(df), 6)
+        self.assertFalse(df["titulo"].str.startswith(("Capa", "Suporte")).any())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+# tests/test_pipeline.py
+# Pipeline completo sobre o FASTQ de exemplo, num diretório temporário (assets/ relativo ao cwd).
+# Rodar da raiz do projeto: python -m pytest -q
+
+import os
+import shutil
+import tempfile
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FASTQ = os.path.join(REPO_DIR, "PAQ18765_pass_barcode81_56f77833_66decbbb_0.fastq")
+
+try:
+    import pandas  # noqa: F401 (a matriz de abundância é um DataFrame)
+    HAS_PANDAS = True
+except ImportError:
+    HAS_PANDAS = False
+
+
+@unittest.skipUnless(HAS_PANDAS and os.path.exists(FASTQ), "pandas ou FASTQ de exemplo ausente")
+class AbundanceMatrixTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        from Modules.main import run_pipeline
+
+        cls.cwd = os.getcwd()
+        cls.tmp = tempfile.mkdtemp(prefix="pipeline_test_")
+        # s1 = FASTQ de exemplo; s2 = suas 100 primeiras leituras
+        for amostra in ("s1", "s2"):
+            os.makedirs(os.path.join(cls.tmp, "data", amostra))
+        shutil.copy(FASTQ, os.path.join(cls.tmp, "data", "s1"))
+        with open(FASTQ) as src, open(os.path.join(cls.tmp, "data", "s2", "s2.fastq"), "w") as dst:
+            for _ in range(400):
+                dst.write(src.readline())
+        os.chdir(cls.tmp)
+        try:
+            _, cls.df = run_pipeline("data", taxonomy_func=lambda seq: "Unknown")
+        finally:
+            os.chdir(cls.cwd)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def test_matrix_counts_cleaned_reads(self):
+        # As leituras brutas passam pelo mesmo corte da limpeza, então casam com as únicas
+        self.assertEqual(int(self.df["s1"].sum()), 265)
+        self.assertEqual(int(self.df["s2"].sum()), 100)
+        self.assertTrue((self.df[["s1", "s2"]].sum(axis=1) > 0).all())
+
+    def test_raw_counts_indexed(self):
+        from Modules.database import connect
+
+        conn = connect(os.path.join(self.tmp, "assets", "Collections", "sequences.sqlite"))
+        try:
+            totals = dict(conn.execute(
+                "SELECT source, SUM(count) FROM sample_counts GROUP BY source").fetchall())
+        finally:
+            conn.close()
+        self.assertEqual(totals.get("raw"), 365)
+        self.assertEqual(totals.get("cleaned"), 365)
+
+
+if __name__ == "__main__":
+    unittest.main()